@@ -17,6 +17,8 @@ from . import addon_updater_ops
 from .core import standard_ops 
 from .core import editor_props
 from .core import editor_ops
+from .core import scene_index
+from .core import weight_utils
 from . import ui, games
 
 class MT_Preferences(AddonPreferences):
@@ -44,12 +46,48 @@ class MT_Preferences(AddonPreferences):
         default=0, min=0, max=59
     )
     
+    # 权重计算后端 (见 core/weight_utils.apply_remap_plans)
+    weight_backend: EnumProperty(
+        name="权重计算后端",
+        items=[
+            ('THREAD', "线程池", "各网格的权重运算在线程池中并行"),
+            ('PROCESS', "进程池 (超大网格)", "顶点数达到阈值的网格放入共享内存，按顶点区间分给多个进程计算"),
+        ],
+        default='THREAD'
+    )
+    process_min_vertices: IntProperty(
+        name="进程池顶点阈值",
+        description="顶点数不少于该值的网格才使用进程池",
+        default=1000000, min=1
+    )
+    weight_chunk_size: IntProperty(
+        name="权重分块大小",
+        description="顶点数超过该值的网格按块流式读取/计算/写回以限制峰值内存 (0 = 不分块)。"
+                    "流式处理逐块在主线程进行，不使用线程池，仅在内存不足时开启",
+        default=0, min=0
+    )
+    weight_write_precision: IntProperty(
+        name="权重写回精度",
+        description="写回前把权重量化到 1/该值 的整数倍，每个顶点组的 add() 调用数不超过该值 + 1 (0 = 精确写回)。"
+                    "合并后的权重几乎各不相同，精确写回时需逐顶点调用；目标格式以 8 位存储权重时可设为 255",
+        default=0, min=0, max=65535
+    )
+    
     def draw(self, context):
         layout = self.layout
+        box = layout.box()
+        box.label(text="权重计算")
+        box.prop(self, "weight_backend")
+        row = box.row()
+        row.enabled = self.weight_backend == 'PROCESS'
+        row.prop(self, "process_min_vertices")
+        box.prop(self, "weight_chunk_size")
+        box.prop(self, "weight_write_precision")
         addon_updater_ops.update_settings_ui(self, context)
 
 
 modules = [
+    scene_index,
     editor_props,
     editor_ops,
     standard_ops, 
@@ -71,6 +109,8 @@ def unregister():
     
     for mod in reversed(modules):
         mod.unregister()
+    
+    weight_utils.shutdown_workers()
 
 if __name__ == "__main__":
     register()
\ No newline at end of file
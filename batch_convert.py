@@ -0,0 +1,282 @@
+"""
+批量转换命令行 (无界面，可在无显示器的 Linux 上运行)
+
+协调进程：把 .blend 文件分发给 N 个后台 Blender 工作进程，汇总 JSON 报告
+    blender -b -P batch_convert.py -- <目录或清单> --x vrc_in_graft.json --y mhwi_MhBone_out.json \\
+        --output-dir out/ --jobs 4 --report report.json
+    (也可直接用 python 运行协调进程，此时需要 --blender 指定 Blender 可执行文件或其在 PATH 中)
+
+工作进程 (由协调进程启动，每个文件一个)：
+    blender -b file.blend -P batch_convert.py -- --worker --x ... --y ... --result r.json ...
+
+输入为目录 (递归查找 *.blend) 或清单文件 (每行一个路径，或 JSON 路径列表)
+单个文件失败 (异常、超时、进程崩溃) 只记录在报告中，不影响其余文件
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STEPS = "convert,rename"
+BATCH_STEPS = ("convert", "rename")  # snap / graft 需要第二个骨架，批处理不支持
+
+def _script_args(argv):
+    """Blender 下只取 "--" 之后的参数"""
+    if "--" in argv:
+        return argv[argv.index("--") + 1:]
+    return argv[1:]
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="batch_convert", description="批量 X -> Y 转换")
+    parser.add_argument("inputs", nargs="*", help=".blend 文件、目录或清单文件")
+    parser.add_argument("--x", required=True, help="X 预设文件名 (assets/import_presets)")
+    parser.add_argument("--y", required=True, help="Y 预设文件名 (assets/bone_presets)")
+    parser.add_argument("--steps", default=DEFAULT_STEPS, help=f"逗号分隔，可选 {', '.join(BATCH_STEPS)}")
+    parser.add_argument("--armature", default=None, help="只处理该名称的骨架 (默认：所有能匹配 X 预设的骨架)")
+    parser.add_argument("--output-dir", default=None, help="结果 .blend 的输出目录")
+    parser.add_argument("--in-place", action="store_true", help="直接覆盖原文件")
+    parser.add_argument("--weight-limit", action="store_true", help="按 Y 预设的 weight_limit 限制影响数并归一化")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="并行的 Blender 进程数")
+    parser.add_argument("--timeout", type=float, default=600, help="单个文件的超时 (秒)")
+    parser.add_argument("--blender", default=None, help="Blender 可执行文件")
+    parser.add_argument("--report", default="batch_report.json", help="JSON 报告路径")
+    # 内部参数
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help=argparse.SUPPRESS)
+    return parser
+
+def _parse_steps(text):
+    steps = [s.strip() for s in text.split(",") if s.strip()]
+    bad = [s for s in steps if s not in BATCH_STEPS]
+    if bad:
+        raise SystemExit(f"[Error] 批处理不支持的步骤: {', '.join(bad)}")
+    return steps
+
+# ==========================================
+# 协调进程
+# ==========================================
+
+def collect_inputs(inputs):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith(".blend"):
+                        files.append(os.path.join(root, name))
+        elif item.endswith(".blend"):
+            files.append(item)
+        else:
+            # 清单文件：JSON 列表或每行一个路径 (相对路径以清单所在目录为基准)
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, "r", encoding="utf-8") as f:
+                text = f.read()
+            try:
+                entries = json.loads(text)
+            except ValueError:
+                entries = [line.strip() for line in text.splitlines()]
+            for entry in entries:
+                if entry and not entry.startswith("#"):
+                    files.append(entry if os.path.isabs(entry) else os.path.join(base, entry))
+
+    seen = set()
+    unique = []
+    for f in files:
+        f = os.path.abspath(f)
+        if f not in seen:
+            seen.add(f)
+            unique.append(f)
+    return unique
+
+def _find_blender(explicit):
+    if explicit:
+        return explicit
+    try:
+        import bpy
+        if bpy.app.binary_path:
+            return bpy.app.binary_path
+    except ImportError:
+        pass
+    return shutil.which("blender") or "blender"
+
+def plan_outputs(files, output_dir):
+    """输出文件名沿用原文件名；不同目录下的同名文件追加序号避免互相覆盖"""
+    outputs = {}
+    used = set()
+    for f in files:
+        stem, ext = os.path.splitext(os.path.basename(f))
+        name = stem + ext
+        n = 1
+        while name in used:
+            name = f"{stem}_{n}{ext}"
+            n += 1
+        used.add(name)
+        outputs[f] = os.path.join(os.path.abspath(output_dir), name)
+    return outputs
+
+def _worker_command(blender, blend_file, args, result_path, output):
+    cmd = [
+        blender, "-b", "--factory-startup", blend_file,
+        "-P", os.path.abspath(__file__), "--",
+        "--worker", "--x", args.x, "--y", args.y,
+        "--steps", args.steps, "--result", result_path,
+    ]
+    if args.armature:
+        cmd += ["--armature", args.armature]
+    if args.weight_limit:
+        cmd.append("--weight-limit")
+    if output is None:
+        cmd.append("--in-place")
+    else:
+        cmd += ["--output", output]
+    return cmd
+
+def run_one(blender, blend_file, args, tmp_dir, index, output):
+    """启动一个后台 Blender 处理单个文件，返回该文件的结果记录"""
+    result_path = os.path.join(tmp_dir, f"result_{index}.json")
+    record = {"file": blend_file, "ok": False}
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            _worker_command(blender, blend_file, args, result_path, output),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            timeout=args.timeout, text=True, errors="replace",
+        )
+        if os.path.exists(result_path):
+            with open(result_path, "r", encoding="utf-8") as f:
+                record.update(json.load(f))
+        else:
+            record["error"] = f"工作进程未产生结果 (退出码 {proc.returncode})"
+        if not record["ok"]:
+            record["log_tail"] = proc.stdout[-2000:]
+    except subprocess.TimeoutExpired:
+        record["error"] = f"超时 ({args.timeout}s)"
+    except OSError as e:
+        record["error"] = f"无法启动 Blender: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+def coordinate(args):
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("[Error] 没有找到 .blend 文件")
+        return 2
+    if not args.in_place and not args.output_dir:
+        print("[Error] 需要 --output-dir 或 --in-place")
+        return 2
+    outputs = {}
+    if not args.in_place:
+        os.makedirs(args.output_dir, exist_ok=True)
+        outputs = plan_outputs(files, args.output_dir)
+
+    blender = _find_blender(args.blender)
+    jobs = max(1, args.jobs)
+    print(f"[Batch] {len(files)} 个文件，{jobs} 个 Blender 进程 ({blender})")
+
+    start = time.perf_counter()
+    records = []
+    with tempfile.TemporaryDirectory(prefix="batch_convert_") as tmp_dir:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_one, blender, f, args, tmp_dir, i, outputs.get(f))
+                       for i, f in enumerate(files)]
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+                status = "OK " if record["ok"] else "ERR"
+                print(f"[Batch] {status} {record['seconds']:.1f}s {record['file']}"
+                      + ("" if record["ok"] else f" - {record.get('error')}"))
+
+    # 报告按输入顺序排列
+    order = {f: i for i, f in enumerate(files)}
+    records.sort(key=lambda r: order[r["file"]])
+    failed = [r for r in records if not r["ok"]]
+    report = {
+        "x_preset": args.x,
+        "y_preset": args.y,
+        "steps": _parse_steps(args.steps),
+        "jobs": jobs,
+        "total": len(records),
+        "succeeded": len(records) - len(failed),
+        "failed": len(failed),
+        "seconds": round(time.perf_counter() - start, 3),
+        "files": records,
+    }
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"[Batch] 完成: {report['succeeded']}/{report['total']} 成功，报告: {args.report}")
+    return 1 if failed else 0
+
+# ==========================================
+# 工作进程 (运行在 Blender 内)
+# ==========================================
+
+def _import_addon():
+    """把插件目录的上一级加入 sys.path，以包的形式导入 (模块内使用相对导入)"""
+    parent, package = os.path.split(ADDON_DIR)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    return importlib.import_module(f"{package}.core.pipeline")
+
+def work(args):
+    import bpy
+    result = {"ok": False, "armatures": []}
+    try:
+        pipeline = _import_addon()
+        job = {"x_preset": args.x, "y_preset": args.y, "steps": _parse_steps(args.steps),
+               "limit_weights": args.weight_limit}
+
+        if args.armature:
+            arm = bpy.data.objects.get(args.armature)
+            if arm is None or arm.type != 'ARMATURE':
+                raise RuntimeError(f"找不到骨架: {args.armature}")
+            armatures = [arm]
+        else:
+            armatures = [o for o in bpy.data.objects if o.type == 'ARMATURE']
+
+        for arm in armatures:
+            resolved = pipeline.resolve(args.x, args.y, arm)
+            if not args.armature and not resolved.analysis_x:
+                continue  # 与 X 预设完全不匹配的骨架 (例如道具) 跳过
+            report = pipeline.run_job(job, arm, resolved=resolved)
+            entry = {"name": arm.name}
+            entry.update(report.as_dict())
+            result["armatures"].append(entry)
+
+        if not result["armatures"]:
+            raise RuntimeError("没有与 X 预设匹配的骨架")
+
+        if args.in_place:
+            bpy.ops.wm.save_mainfile()
+            result["output"] = bpy.data.filepath
+        else:
+            output = args.output or os.path.join(args.output_dir, os.path.basename(bpy.data.filepath))
+            bpy.ops.wm.save_as_mainfile(filepath=output, copy=True)
+            result["output"] = output
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+
+    if args.result:
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if result["ok"] else 1
+
+def main(argv=None):
+    args = _build_parser().parse_args(_script_args(sys.argv if argv is None else argv))
+    _parse_steps(args.steps)
+    return work(args) if args.worker else coordinate(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
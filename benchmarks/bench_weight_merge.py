@@ -0,0 +1,193 @@
+"""
+顶点组合并基准：原 merge_vgroups_to_main 的逐顶点循环 对比 读取 -> WeightMatrix 计算 -> 分桶写回
+
+在普通 CPython 中运行 (不需要 Blender)：
+    python benchmarks/bench_weight_merge.py --verts 300000 --aux 32
+
+网格与顶点组用纯 Python 对象模拟 (接口同 Mesh.vertices / VertexGroup)，两条路径都完整计时：
+    逐顶点：每个辅助组遍历全部顶点，weight() 读取 + add(..., 'ADD') 写入
+    批量：  逐顶点读取 v.groups (同 bpy_adapters.read_vgroup_weights) -> 编译重映射表并计算
+            -> 按权重分桶 add(..., 'REPLACE') 写回并删除辅助组 (同 weight_utils.commit_remap)
+模拟对象的单次调用比 bpy 的 RNA 调用便宜得多，因此同时给出各阶段耗时与 API 调用次数；
+在 Blender 中写回耗时大致正比于 add() 调用次数。两条路径的结果会逐位比较。
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core"))
+
+import remap_plan  # noqa: E402
+from model import WeightMatrix, quantize_weights, weight_buckets  # noqa: E402
+
+# --- 模拟网格 ---
+
+class Element:
+    __slots__ = ("vg", "weight")
+
+    def __init__(self, vg, weight):
+        self.vg = vg
+        self.weight = weight
+
+    @property
+    def group(self):
+        return self.vg.index
+
+class Vertex:
+    __slots__ = ("index", "groups")
+
+    def __init__(self, index):
+        self.index = index
+        self.groups = []
+
+class VertexGroup:
+    """语义同 bpy.types.VertexGroup：weight() 不在组内时抛 RuntimeError，add() 支持 ADD / REPLACE"""
+    def __init__(self, mesh, name, index):
+        self.mesh = mesh
+        self.name = name
+        self.index = index
+        self.removed = False
+
+    def _element(self, i):
+        for g in self.mesh.vertices[i].groups:
+            if g.vg is self:
+                return g
+        return None
+
+    def weight(self, i):
+        self.mesh.calls["weight"] += 1
+        g = self._element(i)
+        if g is None:
+            raise RuntimeError("Vertex not in group")
+        return g.weight
+
+    def add(self, indices, weight, mode):
+        self.mesh.calls["add"] += 1
+        weight = np.float32(weight)
+        for i in indices:
+            g = self._element(i)
+            if g is None:
+                self.mesh.vertices[i].groups.append(Element(self, weight))
+            elif mode == 'ADD':
+                g.weight = np.float32(min(np.float32(g.weight + weight), np.float32(1.0)))
+            else:
+                g.weight = weight
+
+class Mesh:
+    def __init__(self, n_verts, names):
+        self.vertices = [Vertex(i) for i in range(n_verts)]
+        self.vertex_groups = [VertexGroup(self, name, i) for i, name in enumerate(names)]
+        self.calls = {"weight": 0, "add": 0}
+
+    def remove_group(self, vg):
+        """删除顶点组 (后续组的索引前移)；Blender 中在 C 端完成，这里只做标记，条目在比较结果时过滤"""
+        self.vertex_groups.remove(vg)
+        vg.removed = True
+        for i, other in enumerate(self.vertex_groups):
+            other.index = i
+
+    def weights(self):
+        return {(v.index, g.vg.name): float(g.weight)
+                for v in self.vertices for g in v.groups if not g.vg.removed}
+
+def make_mesh(n_verts, names, influences, seed=0):
+    """每个顶点随机 influences 个组"""
+    rng = np.random.default_rng(seed)
+    mesh = Mesh(n_verts, names)
+    groups = np.argsort(rng.random((n_verts, len(names))), axis=1)[:, :influences]
+    weights = rng.random((n_verts, influences)).astype(np.float32)
+    for v, gs, ws in zip(mesh.vertices, groups.tolist(), weights):
+        v.groups = [Element(mesh.vertex_groups[g], w) for g, w in zip(gs, ws)]
+    return mesh
+
+# --- 两条路径 ---
+
+def merge_per_vertex(mesh, main_name, aux_names):
+    """原 merge_vgroups_to_main"""
+    target = next(vg for vg in mesh.vertex_groups if vg.name == main_name)
+    for aux_name in aux_names:
+        source = next(vg for vg in mesh.vertex_groups if vg.name == aux_name)
+        for v in mesh.vertices:
+            try:
+                w = source.weight(v.index)
+                if w > 0:
+                    target.add([v.index], w, 'ADD')
+            except RuntimeError:
+                pass
+        mesh.remove_group(source)
+
+def merge_bulk(mesh, main_name, aux_names, precision, timings):
+    """当前 merge_vgroups_to_main：一次合并的重映射表 -> apply_remap_plan"""
+    start = time.perf_counter()
+    verts, groups, weights = [], [], []
+    for v in mesh.vertices:
+        vi = v.index
+        for g in v.groups:
+            verts.append(vi)
+            groups.append(g.group)
+            weights.append(g.weight)
+    coo = (np.array(verts, dtype=np.int32), np.array(groups, dtype=np.int32),
+           np.array(weights, dtype=np.float32))
+    timings["读取"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    names = [vg.name for vg in mesh.vertex_groups]
+    builder = remap_plan.RemapPlanBuilder(names)
+    builder.merge(main_name, aux_names)
+    plan = builder.build()
+    changes = WeightMatrix.from_coo(*coo, len(mesh.vertices), names).remap_changes(plan)
+    timings["计算"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    orig_vgs = list(mesh.vertex_groups)
+    for i in sorted(plan.removed, reverse=True):
+        mesh.remove_group(orig_vgs[i])
+    for k, (rows, values, removed) in changes.items():
+        vg = orig_vgs[plan.slots[k][1]]
+        for chunk, w in weight_buckets(rows, quantize_weights(values, precision)):
+            vg.add(chunk, w, 'REPLACE')
+    timings["写回"] = time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verts", type=int, default=300000)
+    parser.add_argument("--aux", type=int, default=32, help="并入主组的辅助组数")
+    parser.add_argument("--influences", type=int, default=4, help="每个顶点的影响数")
+    parser.add_argument("--precision", type=int, default=255, help="量化写回的精度 (插件设置 权重写回精度)")
+    args = parser.parse_args()
+    gc.disable()  # 同 timeit：模拟网格对象很多，避免循环垃圾回收落在计时区间内
+
+    names = [f"group_{i}" for i in range(args.aux + 8)]
+    main_name, aux_names = names[0], names[1:args.aux + 1]
+    print(f"{args.verts} 顶点, {len(names)} 组, 每顶点 {args.influences} 个影响, 合并 {args.aux} 个辅助组")
+
+    mesh = make_mesh(args.verts, names, args.influences)
+    start = time.perf_counter()
+    merge_per_vertex(mesh, main_name, aux_names)
+    loop_time = time.perf_counter() - start
+    expected = mesh.weights()
+    print(f"逐顶点循环:      {loop_time:7.3f}s  weight() {mesh.calls['weight']}, add() {mesh.calls['add']}")
+
+    for label, precision in (("批量 (精确)", 0), (f"批量 (精度 {args.precision})", args.precision)):
+        mesh = make_mesh(args.verts, names, args.influences)
+        timings = {}
+        merge_bulk(mesh, main_name, aux_names, precision, timings)
+        total = sum(timings.values())
+        stages = ", ".join(f"{name} {t:.3f}s" for name, t in timings.items())
+        print(f"{label:<16} {total:7.3f}s  add() {mesh.calls['add']}  ({stages})  加速 {loop_time / total:.1f}x")
+
+        got = mesh.weights()
+        assert got.keys() == expected.keys()
+        if precision == 0:
+            assert got == expected, "精确写回的结果与逐顶点循环不一致"
+            print("                  结果与逐顶点循环逐位一致")
+        else:
+            error = max(abs(got[key] - expected[key]) for key in expected)
+            print(f"                  最大量化误差 {error:.6f} (<= 0.5/{precision})")
+
+if __name__ == "__main__":
+    main()
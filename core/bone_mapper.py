@@ -1,4 +1,3 @@
-import bpy
 import json
 import os
 
@@ -30,12 +29,129 @@ STANDARD_BONE_NAMES = [
     "pinky_01_R",  "pinky_02_R", "pinky_03_R"
 ]
 
+ROLE_MAIN = 0
+ROLE_AUX = 1
+
+class CompiledPreset:
+    """
+    预设的编译形式：把所有 main / aux 候选展平成一张
+    骨骼名 -> [(std_key, role, priority)] 的字典，
+    整副骨架只需遍历一次骨骼名即可得出全部匹配结果。
+    """
+    def __init__(self, mapping_data):
+        self.name_index = {}
+        for std_key, entry in mapping_data.items():
+            for priority, name in enumerate(entry.get("main", [])):
+                self.name_index.setdefault(name, []).append((std_key, ROLE_MAIN, priority))
+            for priority, name in enumerate(entry.get("aux", [])):
+                self.name_index.setdefault(name, []).append((std_key, ROLE_AUX, priority))
+
+    def resolve(self, bone_names, std_keys=STANDARD_BONE_NAMES):
+        """
+        一次遍历骨骼名，返回完整分析结果
+        返回：{std_key: (被选中的主骨名, 需要被合并的辅助骨列表)}，按 std_keys 顺序，只包含有命中的键
+        """
+        hits = {}
+        for name in bone_names:
+            for std_key, role, priority in self.name_index.get(name, ()):
+                hits.setdefault(std_key, []).append((role, priority, name))
+
+        analysis = {}
+        for std_key in std_keys:
+            found = hits.get(std_key)
+            if not found:
+                continue
+            found.sort()
+
+            # 抢占制：优先级最高的主骨获胜，其余存在的主骨与辅助骨都视为待合并
+            final_main = None
+            to_merge = []
+            for role, _, name in found:
+                if role == ROLE_MAIN and final_main is None:
+                    final_main = name
+                elif name != final_main and name not in to_merge:
+                    to_merge.append(name)
+
+            analysis[std_key] = (final_main, to_merge)
+        return analysis
+
+class PresetData:
+    """
+    解析并编译好的预设 (缓存共享，调用方不要修改其中的字典)
+    """
+    def __init__(self, data):
+        self.preset_info = data.get("preset_info", {})
+        self.mapping_data = data.get("mappings", {})
+        
+        # 生成反向映射 (主要为了兼容导出逻辑：GameBoneName -> StandardKey)
+        # 我们只取 mappings 中每个 standard_key 的 main 列表里的第一个元素作为主键
+        self.reverse_mapping = {}
+        for std_key, entry in self.mapping_data.items():
+            main_list = entry.get("main", [])
+            if main_list:
+                primary_game_name = main_list[0]
+                self.reverse_mapping[primary_game_name] = std_key
+        
+        self.compiled = CompiledPreset(self.mapping_data)
+        self.weight_limit = parse_weight_limit(data.get("weight_limit"))
+
+def parse_weight_limit(config):
+    """
+    Y 预设中的权重限制：{"max_influences": 8, "normalize": true}
+    返回规范化后的字典；未配置或两项都关闭时返回 None
+    """
+    if not config:
+        return None
+    max_influences = config.get("max_influences")
+    if max_influences is not None:
+        max_influences = int(max_influences)
+        if max_influences <= 0:
+            max_influences = None
+    normalize = bool(config.get("normalize", False))
+    if max_influences is None and not normalize:
+        return None
+    return {"max_influences": max_influences, "normalize": normalize}
+
+# --- 进程级预设缓存 ---
+# filepath -> ((mtime_ns, size), PresetData)
+_preset_cache = {}
+
+def load_preset_file(filepath):
+    """
+    读取预设文件；(路径, 修改时间, 大小) 未变化时直接返回缓存的 PresetData
+    文件不存在或 JSON 损坏时抛出异常
+    """
+    filepath = os.path.realpath(filepath)
+    st = os.stat(filepath)
+    key = (st.st_mtime_ns, st.st_size)
+    
+    cached = _preset_cache.get(filepath)
+    if cached and cached[0] == key:
+        return cached[1]
+    
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    preset = PresetData(data)
+    _preset_cache[filepath] = (key, preset)
+    
+    print(f"[Info] Preset Loaded Successfully: {preset.preset_info.get('name')}")
+    return preset
+
+def invalidate_preset_cache(filepath=None):
+    """预设被保存/删除后调用；不传路径则清空整个缓存"""
+    if filepath is None:
+        _preset_cache.clear()
+    else:
+        _preset_cache.pop(os.path.realpath(filepath), None)
+
 class BoneMapManager:
     def __init__(self):
         # 统一后的数据存储
         self.mapping_data = {}      # 存储 JSON 中的 "mappings" 内容
         self.preset_info = {}       # 存储 JSON 中的 "preset_info" 内容
         self.reverse_mapping = {}    # 反向查找表：仅存储每个 Standard Key 对应的第一个 Main Candidate
+        self.compiled = None         # 编译后的名字索引 (CompiledPreset)
+        self.preset = None           # 缓存中的 PresetData
 
     def get_preset_path(self, filename, is_import_x=False):
         """路径获取"""
@@ -50,7 +166,7 @@ class BoneMapManager:
 
     def load_preset(self, filename, is_import_x=False):
         """
-        加载预设
+        加载预设 (经由进程级缓存，文件未变化时不会重新读取)
         """
         filepath = self.get_preset_path(filename, is_import_x)
         
@@ -59,27 +175,26 @@ class BoneMapManager:
             return False
             
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            self.preset_info = data.get("preset_info", {})
-            self.mapping_data = data.get("mappings", {})
-            
-            # 生成反向映射 (主要为了兼容导出逻辑：GameBoneName -> StandardKey)
-            # 我们只取 mappings 中每个 standard_key 的 main 列表里的第一个元素作为主键
-            self.reverse_mapping = {}
-            for std_key, entry in self.mapping_data.items():
-                main_list = entry.get("main", [])
-                if main_list:
-                    primary_game_name = main_list[0]
-                    self.reverse_mapping[primary_game_name] = std_key
-            
-            print(f"[Info] Preset Loaded Successfully: {self.preset_info.get('name')}")
-            return True
-            
+            preset = load_preset_file(filepath)
         except Exception as e:
             print(f"[Error] Failed to parse JSON: {e}")
             return False
+        
+        self.preset_info = preset.preset_info
+        self.mapping_data = preset.mapping_data
+        self.reverse_mapping = preset.reverse_mapping
+        self.compiled = preset.compiled
+        self.preset = preset
+        return True
+
+    def analyze_armature(self, armature_obj, std_keys=STANDARD_BONE_NAMES):
+        """
+        一次遍历骨架的全部骨骼，返回 {std_key: (主骨名, 待合并辅助骨列表)}
+        结果与逐个调用 get_matches_for_standard 相同
+        """
+        if self.compiled is None:
+            return {}
+        return self.compiled.resolve(armature_obj.data.bones.keys(), std_keys)
 
     def get_matches_for_standard(self, armature_obj, standard_key):
         """
@@ -91,7 +206,8 @@ class BoneMapManager:
             return None, []
 
         bone_entry = self.mapping_data[standard_key]
-        existing_bones = armature_obj.data.bones.keys()
+        # 直接在骨骼集合上做成员判断 (按名字哈希查找)，不再每次构建 keys() 列表
+        existing_bones = armature_obj.data.bones
         
         main_candidates = bone_entry.get("main", [])
         aux_candidates = bone_entry.get("aux", [])
@@ -104,7 +220,7 @@ class BoneMapManager:
             if cand in existing_bones:
                 if final_main is None:
                     final_main = cand
-                else:
+                elif cand != final_main and cand not in to_merge:
                     # 如果后续的 Candidate 也存在，它们将被视为辅助骨合并掉
                     to_merge.append(cand)
 
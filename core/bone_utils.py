@@ -1,6 +1,7 @@
-import os
 import bpy
 import mathutils
+from . import preset_catalog
+from .bpy_adapters import skeleton_from_edit_bones, write_skeleton_to_edit_bones
 
 def set_roll_to_zero_recursive(root_bones):
     """递归将骨骼 Roll 设为 0"""
@@ -74,15 +75,22 @@ def mirror_bone_transform(edit_bones, bone_names):
     
     return True, f"已将 {mirror.name} 对齐到 {ref.name}"
 
-def propagate_movement(bone, offset_vec):
-    """递归移动子骨骼"""
-    for child in bone.children:
-        if child.use_connect:
-            child.tail += offset_vec
-        else:
-            child.head += offset_vec
-            child.tail += offset_vec
-        propagate_movement(child, offset_vec)
+def align_bones_hierarchical(edit_bones, targets):
+    """
+    层级对齐引擎：一次拓扑遍历 (父级先于子级) 完成所有对齐，取代逐骨递归的 propagate_movement
+    targets: {骨骼名: (新 head, 新 tail 或 None)}，均为骨架本地坐标
+        tail 为 None 时平移整根骨骼，保持骨骼向量不变
+    未对齐的子孙继承最近一个对齐祖先的位移；只写回被移动的骨骼
+    计算在 model.Skeleton 上完成 (见 Skeleton.align_hierarchical)
+    返回: 实际对齐的骨骼数
+    """
+    skeleton = skeleton_from_edit_bones(edit_bones)
+    targets = {name: (tuple(head), None if tail is None else tuple(tail))
+               for name, (head, tail) in targets.items() if name in skeleton.index}
+    aligned, moved = skeleton.align_hierarchical(targets)
+    write_skeleton_to_edit_bones(aligned, edit_bones,
+                                 [aligned.names[i] for i in moved.nonzero()[0].tolist()])
+    return len(targets)
 
 def find_bone_smart(bones, name):
     """
@@ -118,32 +126,11 @@ def find_bone_smart(bones, name):
 
 def get_preset_items(subdir):
     """
-    通用函数：扫描指定子目录下的所有 .json 文件
+    通用函数：列出指定子目录下的所有 .json 预设
     subdir: "import_presets" 或 "bone_presets"
+    (扫描结果由 preset_catalog 缓存，目录变化或保存/删除预设时才刷新)
     """
-    # 获取插件根目录
-    # 假设当前脚本位于 core/ 或 ui/ 目录下
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    root_dir = os.path.dirname(current_dir)
-    preset_dir = os.path.join(root_dir, "assets", subdir)
-    
-    items = []
-    
-    if not os.path.exists(preset_dir):
-        return [('NONE', "未找到文件夹", "请检查 assets 目录")]
-
-    files = [f for f in os.listdir(preset_dir) if f.endswith('.json')]
-    
-    for i, f in enumerate(files):
-        # identifier, name, description
-        # identifier 用文件名，name 去掉后缀
-        display_name = f.replace("_preset.json", "").replace(".json", "").upper()
-        items.append((f, display_name, f"加载 {f} 预设"))
-        
-    if not items:
-        return [('NONE', "无预设文件", "")]
-        
-    return items
+    return preset_catalog.get_preset_items(subdir)
 
 # --- 回调函数接口 ---
 
@@ -0,0 +1,108 @@
+import bpy
+import numpy as np
+from .model import Skeleton, quantize_weights, weight_buckets
+
+# bpy 对象 <-> 核心数据模型 (model.py) 的薄适配层
+# 算法本身都在 model 中，这里只负责批量读取与写回
+
+# --- 权重 ---
+
+def read_vgroup_weights(obj, start=0, stop=None):
+    """
+    一次性读取网格的顶点组成员关系 (默认全部顶点，或顶点区间 [start, stop))
+    返回: (顶点索引, 组索引, 权重) 三个等长 NumPy 数组，顶点索引为网格内的绝对索引
+    """
+    vertices = obj.data.vertices
+    if start or stop is not None:
+        vertices = vertices[start:stop]
+    verts, groups, weights = [], [], []
+    for v in vertices:
+        vi = v.index
+        for g in v.groups:
+            verts.append(vi)
+            groups.append(g.group)
+            weights.append(g.weight)
+
+    return (np.array(verts, dtype=np.int32),
+            np.array(groups, dtype=np.int32),
+            np.array(weights, dtype=np.float32))
+
+def iter_vgroup_chunks(obj, chunk_size):
+    """按固定顶点数分块读取：逐块产出 (start, stop, (顶点索引, 组索引, 权重))"""
+    count = len(obj.data.vertices)
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        yield start, stop, read_vgroup_weights(obj, start, stop)
+
+def write_vgroup_weights(vg, indices, weights, precision=0):
+    """
+    批量写回权重 (REPLACE)：按权重值分桶，每个不同的权重只调用一次 add()
+    precision > 0 时先把权重量化到 1/precision 的整数倍，add() 调用数不超过 precision + 1；
+    合并得到的权重几乎各不相同，不量化时调用数接近写入的顶点数
+    """
+    for chunk, w in weight_buckets(indices, quantize_weights(weights, precision)):
+        vg.add(chunk, w, 'REPLACE')
+
+# --- 骨架 ---
+
+def _parents(bones):
+    index = {name: i for i, name in enumerate(bones.keys())}
+    return [index[b.parent.name] if b.parent else -1 for b in bones]
+
+def skeleton_from_armature(armature_data, with_rolls=True):
+    """
+    Armature 数据 (静止姿态，骨架本地坐标) -> Skeleton
+    with_rolls: Bone 没有 roll 属性，需要逐骨由静止矩阵反算；只用位置时传 False 跳过 (roll 为 0)
+    """
+    bones = armature_data.bones
+    count = len(bones)
+    heads = np.empty(count * 3, dtype=np.float32)
+    tails = np.empty(count * 3, dtype=np.float32)
+    connected = np.empty(count, dtype=bool)
+    bones.foreach_get("head_local", heads)
+    bones.foreach_get("tail_local", tails)
+    bones.foreach_get("use_connect", connected)
+
+    rolls = None
+    if with_rolls:
+        axis_roll = bpy.types.Bone.AxisRollFromMatrix
+        rolls = [axis_roll(b.matrix_local.to_3x3())[1] for b in bones]
+    return Skeleton(bones.keys(), _parents(bones), heads, tails, rolls, connected)
+
+def skeleton_from_edit_bones(edit_bones):
+    """编辑模式骨骼 -> Skeleton"""
+    count = len(edit_bones)
+    heads = np.empty(count * 3, dtype=np.float32)
+    tails = np.empty(count * 3, dtype=np.float32)
+    rolls = np.empty(count, dtype=np.float32)
+    connected = np.empty(count, dtype=bool)
+    edit_bones.foreach_get("head", heads)
+    edit_bones.foreach_get("tail", tails)
+    edit_bones.foreach_get("roll", rolls)
+    edit_bones.foreach_get("use_connect", connected)
+    return Skeleton(edit_bones.keys(), _parents(edit_bones), heads, tails, rolls, connected)
+
+def write_skeleton_to_edit_bones(skeleton, edit_bones, names=None):
+    """
+    把 Skeleton 的 head/tail/roll 按名字写回编辑骨骼 (只写位置，不改层级)
+    按父级先于子级的顺序写入；连接的子骨骼 head 由父级 tail 决定，不单独写
+    names: 只写这些骨骼 (默认全部)
+    """
+    wanted = None if names is None else set(names)
+    heads = skeleton.heads.tolist()
+    tails = skeleton.tails.tolist()
+    rolls = skeleton.rolls.tolist()
+    written = 0
+    for i in skeleton.order().tolist():
+        name = skeleton.names[i]
+        if wanted is not None and name not in wanted:
+            continue
+        eb = edit_bones.get(name)
+        if eb is None:
+            continue
+        if not eb.use_connect:
+            eb.head = heads[i]
+        eb.tail = tails[i]
+        eb.roll = rolls[i]
+        written += 1
+    return written
@@ -0,0 +1,84 @@
+from .bone_mapper import STANDARD_BONE_NAMES
+from . import remap_plan
+
+class ConversionPlan:
+    """
+    一对 (X 预设, Y 预设) 的转换计划：集中保存所有派生查找表，
+    供 DirectConvert / UniversalSnap / SmartGraft 以及批处理共享。
+    (只读，不要修改其中的字典/集合)
+    """
+    def __init__(self, preset_x, preset_y):
+        self.preset_x = preset_x
+        self.preset_y = preset_y
+        
+        src_data = preset_x.mapping_data
+        tgt_data = preset_y.mapping_data
+        
+        # 源骨骼名 (main/aux) -> 标准名
+        self.src_to_std = {}
+        # 预设中出现过的所有源骨骼，不在其中的视为物理骨
+        self.source_bones = set()
+        # 标准名 -> 源辅助骨集合
+        self.source_aux = {}
+        
+        for std_key, entry in src_data.items():
+            for m in entry.get('main', []):
+                self.src_to_std[m] = std_key
+                self.source_bones.add(m)
+            for a in entry.get('aux', []):
+                self.src_to_std[a] = std_key
+                self.source_bones.add(a)
+            self.source_aux[std_key] = frozenset(entry.get('aux', []))
+        
+        # 标准名 -> 目标主骨名 (取 Y 表 main 的第一个)
+        self.std_to_target = {}
+        for std_key, entry in tgt_data.items():
+            mains = entry.get('main', [])
+            if mains:
+                self.std_to_target[std_key] = mains[0]
+        
+        # 合并后的影响数限制/归一化 (来自 Y 预设的 weight_limit，可能为 None)
+        self.weight_limit = preset_y.weight_limit
+        
+        # DirectConvert 规则：(源主名候选列表, 源辅助名列表, 目标主名)，按标准骨骼顺序
+        self.conversion_rules = []
+        for std_key in STANDARD_BONE_NAMES:
+            src_entry = src_data.get(std_key)
+            if not src_entry or std_key not in self.std_to_target:
+                continue
+            src_mains = src_entry.get("main", [])
+            if src_mains:
+                self.conversion_rules.append(
+                    (src_mains, src_entry.get("aux", []), self.std_to_target[std_key]))
+        
+        # 顶点组名签名 -> 编译好的重映射表 (随本计划一起失效)
+        self.remap_cache = remap_plan.PlanCache()
+    
+    def compile_remap(self, group_names):
+        """网格顶点组 -> DirectConvert 重映射表；组名签名相同的网格复用同一张表"""
+        return self.remap_cache.get(
+            group_names, lambda names: remap_plan.compile_conversion(names, self.conversion_rules))
+    
+    def is_physics_bone(self, source_bone_name):
+        return source_bone_name not in self.source_bones
+
+# --- 记忆化 ---
+# (id(X), id(Y)) -> ConversionPlan；PresetData 由预设缓存持有，文件变化后会换成新对象
+_plan_cache = {}
+_MAX_PLANS = 32
+
+def get_conversion_plan(preset_x, preset_y):
+    """
+    preset_x / preset_y: bone_mapper.PresetData (即 BoneMapManager.preset)
+    同一对预设重复调用时返回同一个 ConversionPlan
+    """
+    key = (id(preset_x), id(preset_y))
+    plan = _plan_cache.get(key)
+    if plan is not None and plan.preset_x is preset_x and plan.preset_y is preset_y:
+        return plan
+    
+    if len(_plan_cache) >= _MAX_PLANS:
+        _plan_cache.clear()
+    plan = ConversionPlan(preset_x, preset_y)
+    _plan_cache[key] = plan
+    return plan
@@ -0,0 +1,96 @@
+import bpy
+from contextlib import contextmanager
+
+# 骨架编辑模式会话
+# 每次 mode_set 进出 EDIT 都会在 Armature 与 EditBone 之间完整重建一次骨骼数据，
+# 大骨架 (上千根骨骼) 上代价很高。
+# 这里用可重入的上下文管理器统一进出：嵌套使用时只有最外层真正切换模式，
+# 串联的多个步骤 (Snap -> X -> Y -> Graft) 共享同一次 EDIT 往返。
+
+# 骨架指针 -> 嵌套深度
+_depth = {}
+
+def is_active(arm_obj):
+    """该骨架是否处于某个会话内"""
+    return _depth.get(arm_obj.as_pointer(), 0) > 0
+
+def in_any_session():
+    return any(_depth.values())
+
+@contextmanager
+def edit_armature(arm_obj, context=None):
+    """
+    with edit_session.edit_armature(arm_obj) as edit_bones: ...
+    - 骨架已处于编辑模式 (用户手动进入，或外层会话) 时不切换模式
+    - 否则在最外层进入 EDIT，退出时回到进入前的活动物体与模式
+    """
+    if context is None:
+        context = bpy.context
+    key = arm_obj.as_pointer()
+
+    if _depth.get(key, 0) > 0 or arm_obj.mode == 'EDIT':
+        _depth[key] = _depth.get(key, 0) + 1
+        try:
+            yield arm_obj.data.edit_bones
+        finally:
+            _depth[key] -= 1
+        return
+
+    view_layer = context.view_layer
+    prev_active = view_layer.objects.active
+    prev_mode = prev_active.mode if prev_active else 'OBJECT'
+
+    if prev_active and prev_mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    view_layer.objects.active = arm_obj
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    _depth[key] = 1
+    try:
+        yield arm_obj.data.edit_bones
+    finally:
+        _depth[key] = 0
+        # 回到物体模式时 EditBone 写回 Armature
+        bpy.ops.object.mode_set(mode='OBJECT')
+        _restore(view_layer, prev_active, prev_mode)
+
+def _restore(view_layer, prev_active, prev_mode):
+    try:
+        if prev_active is None or prev_active.name not in view_layer.objects:
+            return
+    except ReferenceError:
+        return
+    view_layer.objects.active = prev_active
+    if prev_mode != 'OBJECT':
+        try:
+            bpy.ops.object.mode_set(mode=prev_mode)
+        except RuntimeError:
+            pass
+
+def sync(arm_obj):
+    """
+    会话内需要读取最新的 arm_obj.data.bones 时调用：把 EditBone 写回 Armature，不退出编辑模式
+    """
+    if arm_obj.mode == 'EDIT':
+        arm_obj.update_from_editmode()
+
+def ensure_object_mode(context=None):
+    """
+    顶点组写入前调用：不在任何会话内且当前不是物体模式时切回物体模式
+    (会话内骨架处于编辑模式，网格仍可直接写权重，不必打断会话)
+    """
+    if context is None:
+        context = bpy.context
+    if not in_any_session() and context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+def tag_redraw(context=None):
+    """替代 POSE/EDIT 来回切换：仅请求重绘当前视图"""
+    if context is None:
+        context = bpy.context
+    screen = context.screen
+    if screen is None:
+        return
+    for area in screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
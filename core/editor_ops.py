@@ -2,7 +2,7 @@ import bpy
 import json
 import os
 import re
-from . import ui_config, bone_mapper
+from . import ui_config, bone_mapper, preset_catalog
 from .bone_mapper import BoneMapManager, STANDARD_BONE_NAMES
 
 # === 初始化/刷新列表 ===
@@ -265,6 +265,8 @@ class MODDER_OT_SaveXPreset(bpy.types.Operator):
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(final_data, f, indent=2, ensure_ascii=False)
+            bone_mapper.invalidate_preset_cache(filepath)
+            preset_catalog.invalidate("import_presets")
             self.report({'INFO'}, f"预设已保存: {filename}")
         except Exception as e:
             self.report({'ERROR'}, f"保存失败: {str(e)}")
@@ -354,6 +356,8 @@ class MODDER_OT_DeleteXPreset(bpy.types.Operator):
         if os.path.exists(filepath):
             try:
                 os.remove(filepath)
+                bone_mapper.invalidate_preset_cache(filepath)
+                preset_catalog.invalidate("import_presets")
                 # 强制刷新 UI 列表 (Blender EnumProperty 有缓存，可能需要鼠标晃一下才能刷具体)
                 # 这里我们重置一下变量名来触发更新
                 settings.import_preset_enum = "" 
@@ -0,0 +1,15 @@
+import mathutils
+from .bpy_adapters import skeleton_from_armature
+
+def bone_positions_in_space(source_arm, target_arm):
+    """
+    把源骨架所有骨骼的 head/tail 批量转换到目标骨架的本地坐标
+    (目标逆矩阵 @ 源世界矩阵 合成一个矩阵，只做一次矩阵乘法)
+    返回: {骨骼名: (head, tail)}，值为 mathutils.Vector
+    """
+    matrix = target_arm.matrix_world.inverted() @ source_arm.matrix_world
+    skeleton = skeleton_from_armature(source_arm.data, with_rolls=False).transformed(matrix)
+    
+    Vector = mathutils.Vector
+    return {name: (Vector(h), Vector(t))
+            for name, h, t in zip(skeleton.names, skeleton.heads.tolist(), skeleton.tails.tolist())}
@@ -0,0 +1,412 @@
+"""
+与 bpy 无关的核心数据模型 (纯 Python + NumPy)
+
+- Skeleton: 骨架 = 父级索引数组 + head / tail / roll 数组
+- WeightMatrix: 顶点 x 顶点组 的稀疏 CSR 权重矩阵 (合并/简化/转换共用的唯一权重表示)
+
+bpy 对象与模型之间的转换见 bpy_adapters.py。
+本模块不做任何相对导入，可以把 core 目录加入 sys.path 后在普通 CPython 中直接
+`import model`，用于单元测试与性能分析。
+"""
+import numpy as np
+
+def transform_points(matrix, points):
+    """(N,3) 点集整体左乘一个 4x4 矩阵 (接受 mathutils.Matrix 或数组)"""
+    m = np.array(matrix, dtype=np.float64)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+class Skeleton:
+    """
+    names:   骨骼名列表
+    parents: (N,) int32，父骨骼索引，根骨骼为 -1
+    heads / tails: (N,3) float32，骨架本地坐标
+    rolls:   (N,) float32，弧度
+    connected: (N,) bool，head 连接在父骨骼 tail 上 (use_connect)
+    """
+    def __init__(self, names, parents, heads, tails, rolls=None, connected=None):
+        self.names = list(names)
+        count = len(self.names)
+        self.parents = np.asarray(parents, dtype=np.int32).reshape(count)
+        self.heads = np.asarray(heads, dtype=np.float32).reshape(count, 3)
+        self.tails = np.asarray(tails, dtype=np.float32).reshape(count, 3)
+        if rolls is None:
+            rolls = np.zeros(count, dtype=np.float32)
+        self.rolls = np.asarray(rolls, dtype=np.float32).reshape(count)
+        if connected is None:
+            connected = np.zeros(count, dtype=bool)
+        self.connected = np.asarray(connected, dtype=bool).reshape(count) & (self.parents >= 0)
+        self._index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def index(self):
+        """骨骼名 -> 索引"""
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        return self._index
+
+    def parent_name(self, name):
+        p = self.parents[self.index[name]]
+        return self.names[p] if p >= 0 else None
+
+    def lengths(self):
+        return np.linalg.norm(self.tails - self.heads, axis=1)
+
+    def depths(self):
+        """每根骨骼到根的层级深度 (根为 0)；按深度排序即为父级先于子级的顺序"""
+        depth = np.zeros(len(self), dtype=np.int32)
+        current = self.parents.copy()
+        active = current >= 0
+        while active.any():
+            depth[active] += 1
+            current[active] = self.parents[current[active]]
+            active = current >= 0
+        return depth
+
+    def order(self):
+        """父级先于子级的索引顺序 (同层保持原顺序)"""
+        return np.argsort(self.depths(), kind='stable')
+
+    def children(self):
+        """父索引 -> [子索引]"""
+        result = {}
+        for i, p in enumerate(self.parents.tolist()):
+            if p >= 0:
+                result.setdefault(p, []).append(i)
+        return result
+
+    def transformed(self, matrix):
+        """整体变换 head/tail 后的新骨架 (roll 不变)"""
+        return Skeleton(self.names, self.parents,
+                        transform_points(matrix, self.heads.astype(np.float64)),
+                        transform_points(matrix, self.tails.astype(np.float64)),
+                        self.rolls, self.connected)
+
+    def renamed(self, mapping):
+        """按 {旧名: 新名} 重命名后的新骨架"""
+        names = [mapping.get(n, n) for n in self.names]
+        return Skeleton(names, self.parents, self.heads, self.tails, self.rolls, self.connected)
+
+    def align_hierarchical(self, targets):
+        """
+        层级对齐 (bone_utils.align_bones_hierarchical 的计算部分)
+        targets: {骨骼名: (新 head, 新 tail 或 None)}；tail 为 None 时平移整根骨骼
+        未对齐的子孙继承最近一个对齐祖先的位移；连接骨骼的 head 始终等于父骨骼 tail
+        (对齐一根连接骨骼的 head 会同时移动父骨骼的 tail，与 EditBone 的行为一致)
+        返回: (新骨架, moved)，moved 为被移动的骨骼的布尔掩码
+        """
+        count = len(self)
+        heads = self.heads.copy()
+        tails = self.tails.copy()
+        offset = np.zeros((count, 3), dtype=np.float32)
+        targeted = np.zeros(count, dtype=bool)
+        new_tails = {}
+        for name, (head, tail) in targets.items():
+            i = self.index.get(name)
+            if i is None:
+                continue
+            targeted[i] = True
+            heads[i] = head
+            offset[i] = heads[i] - self.heads[i]
+            if tail is not None:
+                new_tails[i] = tail
+
+        # 按层级自上而下传递位移：每层一次数组运算
+        moved = targeted.copy()
+        depths = self.depths()
+        for d in range(1, int(depths.max()) + 1 if count else 0):
+            level = np.flatnonzero((depths == d) & ~targeted)
+            parents = self.parents[level]
+            offset[level] = offset[parents]
+            moved[level] = moved[parents]
+
+        follow = moved & ~targeted
+        heads[follow] += offset[follow]
+        tails[moved] = self.tails[moved] + offset[moved]
+        for i, tail in new_tails.items():
+            tails[i] = tail
+
+        # 连接关系：被对齐的连接骨骼拉动父骨骼 tail，其余连接骨骼的 head 跟随父骨骼 tail
+        pulled = np.flatnonzero(targeted & self.connected)
+        tails[self.parents[pulled]] = heads[pulled]
+        moved[self.parents[pulled]] = True
+        linked = self.connected & ~targeted
+        heads[linked] = tails[self.parents[linked]]
+        moved |= linked & moved[np.maximum(self.parents, 0)]
+
+        return Skeleton(self.names, self.parents, heads, tails, self.rolls, self.connected), moved
+
+class WeightMatrix:
+    """
+    稀疏 CSR 权重矩阵：行 = 顶点，列 = 顶点组
+    indptr:  (n_rows+1,) int64；第 r 行的条目为 [indptr[r], indptr[r+1])
+    indices: (nnz,) int32 列号，每行内按列号升序
+    data:    (nnz,) float32 权重
+    col_names: 列名 (顶点组名)
+    所有操作都返回新矩阵，不修改自身
+    """
+    def __init__(self, indptr, indices, data, col_names):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.col_names = list(col_names)
+
+    @property
+    def n_rows(self):
+        return len(self.indptr) - 1
+
+    @property
+    def n_cols(self):
+        return len(self.col_names)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def row_counts(self):
+        """每个顶点的影响数"""
+        return np.diff(self.indptr)
+
+    def row_ids(self):
+        """每个条目所在的行号"""
+        return np.repeat(np.arange(self.n_rows, dtype=np.int32), self.row_counts())
+
+    # --- 构造 / 导出 ---
+
+    @classmethod
+    def from_coo(cls, rows, cols, data, n_rows, col_names):
+        """
+        由 (行, 列, 值) 三元组构建；重复的 (行, 列) 按出现顺序相加
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        data = np.asarray(data, dtype=np.float32)
+        n_cols = len(col_names)
+
+        keys = rows * max(n_cols, 1) + cols
+        if len(keys) and np.any(keys[1:] <= keys[:-1]):
+            uniq, inverse = np.unique(keys, return_inverse=True)
+            if len(uniq) != len(keys):
+                sums = np.zeros(len(uniq), dtype=np.float32)
+                np.add.at(sums, inverse, data)
+                data = sums
+            else:
+                data = data[np.argsort(keys, kind='stable')]
+            keys = uniq
+        return cls._from_sorted_keys(keys, data, n_rows, col_names)
+
+    @classmethod
+    def _from_sorted_keys(cls, keys, data, n_rows, col_names):
+        """keys = 行 * n_cols + 列，已严格升序"""
+        n_cols = max(len(col_names), 1)
+        rows = keys // n_cols
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, (keys % n_cols).astype(np.int32), data, col_names)
+
+    # --- 列操作 ---
+
+    def remap(self, plan):
+        """应用重映射表 (remap_plan.RemapPlan)：列变为 plan.slots 的顺序"""
+        dest, rank = plan.index_table()
+        return self.reindex(dest, [name for name, _, _ in plan.slots], rank)
+
+    def reindex(self, dest, col_names, rank=None):
+        """
+        列重映射 (合并 + 重命名 + 删除 一次完成)
+        dest[j]: 原列 j 流向的新列号 (-1 表示丢弃)
+        rank[j]: 在新列内的叠加顺序 (0 为主列自身；>0 的辅助列只有权重 > 0 的条目参与)
+        同一行流向同一新列的多个条目按 rank 顺序以 float32 相加，最后钳制到 1.0
+        """
+        dest = np.asarray(dest, dtype=np.int64)
+        rank = np.zeros(len(dest), dtype=np.int32) if rank is None else np.asarray(rank, dtype=np.int32)
+        n_new = max(len(col_names), 1)
+
+        e_dest = dest[self.indices]
+        e_rank = rank[self.indices]
+        keep = (e_dest >= 0) & ((e_rank == 0) | (self.data > 0))
+        e_dest, e_rank = e_dest[keep], e_rank[keep]
+        e_rows, e_data = self.row_ids()[keep], self.data[keep]
+
+        keys, inverse = np.unique(e_rows.astype(np.int64) * n_new + e_dest, return_inverse=True)
+        order = np.argsort(e_rank, kind='stable')
+        sums = np.zeros(len(keys), dtype=np.float32)
+        np.add.at(sums, inverse[order], e_data[order])
+        np.minimum(sums, 1.0, out=sums)
+        return WeightMatrix._from_sorted_keys(keys, sums, self.n_rows, col_names)
+
+    def remap_final(self, plan, weight_limit=None, columns=None):
+        """重映射 + 影响数限制/归一化后的最终矩阵 (列为 plan.slots 的顺序)"""
+        final = self.remap(plan)
+        if weight_limit:
+            final = final.limit_influences(weight_limit["max_influences"],
+                                           weight_limit["normalize"], columns)
+        return final
+
+    def column_entries(self, cols):
+        """指定列的全部条目：返回 {列号: (行, 权重)}，行号升序，不含空列"""
+        empty = np.empty(0, dtype=np.int32)
+        entries = group_changes(self.row_ids(), self.indices, self.data, empty, empty)
+        return {j: entries[j][:2] for j in cols if j in entries}
+
+    def remap_changes(self, plan, weight_limit=None, columns=None):
+        """
+        重映射 + 影响数限制/归一化，返回相对"只做删除/重命名/新建"状态的写回差异
+        weight_limit: {"max_influences": k, "normalize": bool} 或 None
+        columns: 参与限制/归一化的新列 (plan.slots 序号的布尔掩码)
+        返回: {slot 序号: (需写入的行, 新权重, 需移除的行)}，格式同 diff
+        只做数组运算，可在工作线程中调用
+        """
+        slot_names = [name for name, _, _ in plan.slots]
+        final = self.remap_final(plan, weight_limit, columns)
+        base_dest = [-1] * self.n_cols
+        for k, (_, b, _) in enumerate(plan.slots):
+            if b is not None:
+                base_dest[b] = k
+        base = self.reindex(base_dest, slot_names)
+        return base.diff(final)
+
+    # --- 行操作 ---
+
+    def _column_mask(self, columns):
+        """columns (列号列表或布尔掩码) -> 条目级布尔掩码；None 表示全部条目"""
+        if columns is None:
+            return np.ones(self.nnz, dtype=bool)
+        columns = np.asarray(columns)
+        if columns.dtype == bool:
+            mask = columns
+        else:
+            mask = np.zeros(self.n_cols, dtype=bool)
+            mask[columns.astype(np.int64)] = True
+        return mask[self.indices]
+
+    def normalize_rows(self, columns=None):
+        """
+        每行权重和归一化为 1 (和为 0 的行保持不变)
+        columns: 只在这些列之间归一化，其余列的条目原样保留
+        """
+        eligible = self._column_mask(columns)
+        rows = self.row_ids()
+        sums = np.bincount(rows[eligible], weights=self.data[eligible], minlength=self.n_rows)
+        scale = np.ones(self.n_rows, dtype=np.float64)
+        nonzero = sums > 0
+        scale[nonzero] = 1.0 / sums[nonzero]
+        data = self.data.copy()
+        data[eligible] = (self.data[eligible] * scale[rows[eligible]]).astype(np.float32)
+        return WeightMatrix(self.indptr.copy(), self.indices.copy(), data, self.col_names)
+
+    def limit_influences(self, max_influences=None, normalize=False, columns=None):
+        """影响数限制 + 归一化 (两步都只作用于 columns 指定的列)"""
+        result = self
+        if max_influences is not None:
+            result = result.prune_top_k(max_influences, columns)
+        if normalize:
+            result = result.normalize_rows(columns)
+        return result
+
+    def prune_top_k(self, k, columns=None):
+        """
+        每行只保留权重最大的 k 个影响 (同权重时保留列号较小者)
+        columns: 只在这些列之间竞争 (布尔掩码或列号列表)；其余列的条目原样保留且不占名额
+        """
+        rows = self.row_ids()
+        eligible = self._column_mask(columns)
+
+        # 行内按权重降序排列，计算每个条目在行内的名次
+        e_idx = np.flatnonzero(eligible)
+        order = e_idx[np.lexsort((self.indices[e_idx], -self.data[e_idx], rows[e_idx]))]
+        e_rows = rows[order]
+        starts = np.searchsorted(e_rows, e_rows, side='left')
+        rank_in_row = np.arange(len(order)) - starts
+
+        keep = ~eligible
+        keep[order[rank_in_row < k]] = True
+        counts = np.bincount(rows[keep], minlength=self.n_rows)
+        indptr = np.zeros(self.n_rows + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return WeightMatrix(indptr, self.indices[keep], self.data[keep], self.col_names)
+
+    # --- 比较 ---
+
+    def diff_masks(self, other):
+        """
+        与另一个同列的矩阵比较 (other 为修改后的版本)
+        返回: (write, removed) 两个条目级布尔掩码
+        write[e]:   other 的条目 e 是新增或值有变化
+        removed[e]: self 的条目 e 在 other 中不存在
+        """
+        if other.col_names != self.col_names or other.n_rows != self.n_rows:
+            raise ValueError("WeightMatrix.diff requires matching shapes")
+        n_cols = max(self.n_cols, 1)
+        old_keys = self.row_ids().astype(np.int64) * n_cols + self.indices
+        new_keys = other.row_ids().astype(np.int64) * n_cols + other.indices
+
+        pos = np.searchsorted(old_keys, new_keys)
+        pos_c = np.minimum(pos, max(len(old_keys) - 1, 0))
+        exists = (pos < len(old_keys)) & (old_keys[pos_c] == new_keys) if len(old_keys) else np.zeros(len(new_keys), dtype=bool)
+        write = ~exists
+        write[exists] = self.data[pos_c[exists]] != other.data[exists]
+        removed = ~np.isin(old_keys, new_keys, assume_unique=True)
+        return write, removed
+
+    def diff(self, other):
+        """
+        与另一个同列的矩阵比较 (other 为修改后的版本)
+        返回: {列号: (需写入的行, 新权重, 需移除的行)}，只包含有变化的列
+        """
+        write, removed = self.diff_masks(other)
+        return group_changes(other.row_ids()[write], other.indices[write], other.data[write],
+                             self.row_ids()[removed], self.indices[removed])
+
+def group_changes(w_rows, w_cols, w_vals, r_rows, r_cols):
+    """
+    按列分组写回差异 (各数组内行号升序)
+    返回: {列号: (需写入的行, 新权重, 需移除的行)}
+    """
+    w_order = np.argsort(w_cols, kind='stable')
+    r_order = np.argsort(r_cols, kind='stable')
+    w_cols, r_cols = w_cols[w_order], r_cols[r_order]
+    w_rows, w_vals, r_rows = w_rows[w_order], w_vals[w_order], r_rows[r_order]
+
+    result = {}
+    for j in np.union1d(w_cols, r_cols).tolist():
+        w0, w1 = np.searchsorted(w_cols, [j, j + 1])
+        r0, r1 = np.searchsorted(r_cols, [j, j + 1])
+        result[int(j)] = (w_rows[w0:w1].astype(np.int32), w_vals[w0:w1],
+                          r_rows[r0:r1].astype(np.int32))
+    return result
+
+def stream_remap(chunks, plan, weight_limit=None, columns=None, slots=None):
+    """
+    分块重映射 (见 weight_utils._commit_streamed)
+    chunks: 逐块产出 (start, stop, (顶点索引, 组索引, 权重))，顶点索引为绝对索引
+    逐块产出 (start, {slot 序号: (绝对行号, 最终权重)})，只包含 slots 中的列 (默认全部)
+    每块处理完即可释放，峰值内存只与块大小有关
+    """
+    slots = range(len(plan.slots)) if slots is None else slots
+    for start, stop, (verts, groups, weights) in chunks:
+        matrix = WeightMatrix.from_coo(verts - start, groups, weights, stop - start, plan.group_names)
+        entries = matrix.remap_final(plan, weight_limit, columns).column_entries(slots)
+        yield start, {k: (rows + start, values) for k, (rows, values) in entries.items()}
+
+# --- 写回 ---
+
+def quantize_weights(weights, steps):
+    """权重量化到 1/steps 的整数倍 (steps <= 0 时原样返回)，不同权重值最多 steps + 1 个"""
+    if steps <= 0:
+        return weights
+    return (np.round(weights.astype(np.float64) * steps) / steps).astype(np.float32)
+
+def weight_buckets(indices, weights):
+    """按权重值分桶：产出 (该权重的顶点索引列表, 权重)，每个不同的权重一项"""
+    if len(indices) == 0:
+        return
+    order = np.argsort(weights, kind='stable')
+    w_sorted = weights[order]
+    i_sorted = indices[order]
+    splits = np.flatnonzero(np.diff(w_sorted)) + 1
+    starts = np.concatenate(([0], splits))
+    for chunk, w in zip(np.split(i_sorted, splits), w_sorted[starts].tolist()):
+        yield chunk.tolist(), w
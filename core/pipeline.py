@@ -0,0 +1,312 @@
+import bpy, mathutils
+import time
+from .bone_mapper import BoneMapManager, STANDARD_BONE_NAMES
+from . import weight_utils, bone_utils, math_utils, scene_index, conversion_plan, edit_session
+
+# ==========================================
+# X -> Y 转换流水线
+# ==========================================
+# 作业 (job) 为声明式字典：
+#   {"x_preset": "vrc_in_graft.json", "y_preset": "mhwi_MhBone_out.json",
+#    "steps": ["snap", "graft", "convert", "rename"],
+#    "limit_weights": False}  # 可选，默认 False：为 True 时按 Y 预设的 weight_limit 限制影响数并归一化
+# 步骤：
+#   snap    目标骨架 (Y) 的身体骨骼对齐源骨架 (X)
+#   graft   源骨架的物理骨移植到目标骨架
+#   convert 源网格顶点组 X -> Y (合并辅助组 + 重命名)
+#   rename  源骨架骨骼 X -> Y (重命名主骨，删除已合并权重的辅助骨；隐含 convert 的权重处理)
+# 无论 steps 的书写顺序如何，都编译成固定的最少遍数：
+#   1. 一次映射解析 (预设加载 + 转换计划 + 源骨架匹配)
+#   2. 目标骨架一次编辑会话 (snap + graft)
+#   3. 每个网格一次权重重映射
+#   4. 源骨架一次编辑会话 (rename)
+
+STEPS = ("snap", "graft", "convert", "rename")
+
+class PipelineError(Exception):
+    pass
+
+class Resolved:
+    """一次映射解析的结果，各步骤共用"""
+    def __init__(self, mapper_x, mapper_y, plan, analysis_x):
+        self.mapper_x = mapper_x
+        self.mapper_y = mapper_y
+        self.plan = plan
+        self.analysis_x = analysis_x
+
+def resolve(x_preset, y_preset, source_arm):
+    mapper_x = BoneMapManager()
+    if not mapper_x.load_preset(x_preset, is_import_x=True):
+        raise PipelineError(f"无法加载 X 预设: {x_preset}")
+    mapper_y = BoneMapManager()
+    if not mapper_y.load_preset(y_preset, is_import_x=False):
+        raise PipelineError(f"无法加载 Y 预设: {y_preset}")
+
+    plan = conversion_plan.get_conversion_plan(mapper_x.preset, mapper_y.preset)
+    analysis_x = mapper_x.analyze_armature(source_arm) if source_arm else {}
+    return Resolved(mapper_x, mapper_y, plan, analysis_x)
+
+# --- 步骤函数 (由各操作符与流水线共用) ---
+
+def snap_bones(edit_bones, source_arm, target_arm, analysis_x, plan):
+    """
+    Snap：目标骨架的身体骨骼头部对齐源骨骼 (需在目标骨架编辑会话内调用)
+    返回对齐的骨骼数
+    """
+    # 全部源骨骼一次性批量转换到目标骨架本地坐标
+    source_local = math_utils.bone_positions_in_space(source_arm, target_arm)
+
+    targets = {}
+    for std_key in STANDARD_BONE_NAMES:
+        match = analysis_x.get(std_key)
+        if not match or match[0] not in source_local:
+            continue
+        # 获取目标骨名 (从 Y 表)
+        tgt_name = plan.std_to_target.get(std_key)
+        if not tgt_name or tgt_name not in edit_bones:
+            continue
+        # 只对齐头部，尾部随之平移 (保持长度和方向)
+        targets[tgt_name] = (source_local[match[0]][0], None)
+
+    # 刚性对齐：父级先于子级一次遍历，子级继承父级位移后再移动到自己的目标
+    return bone_utils.align_bones_hierarchical(edit_bones, targets)
+
+def find_physics_bones(source_arm, plan):
+    """只要不在 X 预设里的，都算物理骨"""
+    return [b.name for b in source_arm.data.bones if plan.is_physics_bone(b.name)]
+
+def graft_physics_bones(edit_bones, source_arm, target_arm, plan, physics_bones_names):
+    """
+    Graft：复制物理骨并为物理链末端生成 _End 骨骼，统一竖直化后重建父级
+    (需在目标骨架编辑会话内调用) 返回处理的骨骼数
+    """
+    src_to_std = plan.src_to_std
+    std_to_tgt_bone = plan.std_to_target
+    physics_bones_set = set(physics_bones_names)
+    tgt_mat_inv = target_arm.matrix_world.inverted()
+
+    created_count = 0
+    new_bones_map = {} # {src_name: new_bone_name}
+
+    # 临时列表：存储所有新生成的骨骼对象（包括标准物理骨和End骨）以便稍后统一竖直化
+    # 格式: (edit_bone, length_to_use)
+    bones_to_verticalize = []
+
+    # 1. 第一轮：创建所有基础物理骨
+    for p_name in physics_bones_names:
+        src_bone = source_arm.data.bones.get(p_name)
+        src_pb = source_arm.pose.bones.get(p_name)
+        if not src_bone or not src_pb: continue
+
+        if p_name in edit_bones:
+            eb = edit_bones[p_name]
+        else:
+            eb = edit_bones.new(p_name)
+        new_bones_map[p_name] = eb.name
+
+        # 基础定位 (Head)
+        src_world_head = source_arm.matrix_world @ src_pb.head
+        eb.head = tgt_mat_inv @ src_world_head
+        # 暂时随便给个 Tail，稍后会被竖直化覆盖
+        eb.tail = eb.head + mathutils.Vector((0, 0, 0.1))
+
+        bones_to_verticalize.append((eb, src_bone.length))
+
+    # 2. 第二轮：检测末端并创建 _End 骨骼
+    # (此时所有基础物理骨已创建，位置对应 Source Head)
+    for p_name in physics_bones_names:
+        src_bone = source_arm.data.bones.get(p_name)
+
+        # 判断是否是"叶子节点" (在物理骨集合中没有子级)
+        # 注意：只检查物理骨集合内的子级。如果它下面连着非物理骨(极少见)，这里也会视为断开。
+        is_leaf = True
+        for child in src_bone.children:
+            if child.name in physics_bones_set:
+                is_leaf = False
+                break
+
+        if is_leaf:
+            end_bone_name = f"{p_name}_End"
+            if end_bone_name in edit_bones:
+                end_eb = edit_bones[end_bone_name]
+            else:
+                end_eb = edit_bones.new(end_bone_name)
+
+            # 【关键逻辑】：End 骨骼的头部 = 原 Source 骨骼的尾部
+            src_pb = source_arm.pose.bones.get(p_name)
+            src_world_tail = source_arm.matrix_world @ src_pb.tail
+
+            end_eb.head = tgt_mat_inv @ src_world_tail
+            end_eb.tail = end_eb.head + mathutils.Vector((0, 0, 0.05))
+
+            # 建立与父级的连接 (逻辑连接)
+            if p_name in new_bones_map:
+                end_eb.parent = edit_bones[new_bones_map[p_name]]
+
+            # End 骨骼长度固定为 0.05
+            bones_to_verticalize.append((end_eb, 0.05))
+
+    # 3. 第三轮：统一竖直化 (Vertical Reset)，覆盖刚才的 Tail 位置
+    for eb, length in bones_to_verticalize:
+        # 强制断连
+        eb.use_connect = False
+        # 竖直化 (保持 Head 不动)，防止长度为 0
+        safe_length = length if length > 0.001 else 0.05
+        eb.tail = eb.head + mathutils.Vector((0, 0, safe_length))
+        eb.roll = 0
+        created_count += 1
+
+    # 4. 智能重建父级 (仅针对基础物理骨，End骨刚才已处理)
+    for src_name, tgt_name in new_bones_map.items():
+        eb = edit_bones.get(tgt_name)
+        src_bone = source_arm.data.bones.get(src_name)
+
+        if not src_bone or not src_bone.parent: continue
+
+        src_p_name = src_bone.parent.name
+        target_parent_name = None
+
+        # A. 父级是物理骨
+        if src_p_name in new_bones_map:
+            target_parent_name = new_bones_map[src_p_name]
+        # B. 父级是映射骨 (Main/Aux)
+        elif src_p_name in src_to_std:
+            std_key = src_to_std[src_p_name]
+            if std_key in std_to_tgt_bone:
+                target_parent_name = std_to_tgt_bone[std_key]
+
+        if target_parent_name and target_parent_name in edit_bones:
+            eb.parent = edit_bones[target_parent_name]
+            eb.use_connect = False
+
+    return created_count
+
+def convert_mesh_weights(meshes, plan, weight_limit=None):
+    """
+    Convert：每个网格的顶点组按转换规则编译成一张重映射表，一次遍历应用
+    weight_limit: 同一次遍历中的影响数限制/归一化 (通常为 plan.weight_limit)
+    多个网格的数组运算在线程池中并行 (见 weight_utils.apply_remap_plans)
+    共享同一网格数据且顶点组相同的物体只计算/写回一次，结果对全部成员生效
+    返回实际更新的网格 (物体) 数
+    """
+    items = []
+    shared = {}
+    for mesh_obj, members in weight_utils.group_shared_meshes(meshes):
+        remap = plan.compile_remap(mesh_obj.vertex_groups.keys())
+        if remap.changed or weight_limit:
+            items.append((mesh_obj, remap))
+            shared[mesh_obj] = len(members)
+    modified = weight_utils.apply_remap_plans(items, weight_limit)
+    return sum(shared[obj] for obj in modified)
+
+def rename_bones_to_target(edit_bones, analysis_x, plan):
+    """
+    Rename：源骨架骨骼直接改为 Y 名 (需在源骨架编辑会话内调用)
+    只有 Y 表中存在的标准骨骼才会被处理；其辅助骨的权重已在 convert 中合并，直接删除
+    返回 (重命名数, 删除数)
+    """
+    rename_count = 0
+    deleted_count = 0
+    for std_key, (main_name, aux_list) in analysis_x.items():
+        tgt_name = plan.std_to_target.get(std_key)
+        if not tgt_name:
+            continue
+        if main_name and main_name in edit_bones:
+            edit_bones[main_name].name = tgt_name
+            rename_count += 1
+        for aux_name in aux_list:
+            if aux_name in edit_bones:
+                edit_bones.remove(edit_bones[aux_name])
+                deleted_count += 1
+    return rename_count, deleted_count
+
+# --- 流水线 ---
+
+class PipelineReport:
+    """逐阶段计时与结果"""
+    def __init__(self):
+        self.stages = []    # [(阶段名, 秒)]
+        self.results = {}   # 步骤名 -> 结果
+
+    def summary(self):
+        total = sum(t for _, t in self.stages)
+        parts = ", ".join(f"{name} {t * 1000:.0f}ms" for name, t in self.stages)
+        return f"{parts} | 总计 {total * 1000:.0f}ms"
+
+    def as_dict(self):
+        return {
+            "stages": {name: round(t, 6) for name, t in self.stages},
+            "results": dict(self.results),
+        }
+
+class _Timer:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report.stages.append((self.name, time.perf_counter() - self.start))
+        return False
+
+def normalize_steps(steps):
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        raise PipelineError(f"未知步骤: {', '.join(unknown)}")
+    return set(steps)
+
+def run_job(job, source_arm, target_arm=None, meshes=None, context=None, resolved=None):
+    """
+    执行一个作业
+    source_arm: 源骨架 (X)；target_arm: 目标骨架 (Y，snap/graft 需要)
+    meshes: 参与 convert 的网格，默认为受源骨架形变的全部网格
+    resolved: 调用方已对该骨架执行过 resolve() 时传入其结果，不再重复解析
+    返回 PipelineReport；预设/参数错误时抛出 PipelineError
+    """
+    if context is None:
+        context = bpy.context
+    steps = normalize_steps(job.get("steps", ()))
+    report = PipelineReport()
+
+    if source_arm is None:
+        raise PipelineError("缺少源骨架 (X)")
+    if steps & {"snap", "graft"} and target_arm is None:
+        raise PipelineError("snap / graft 需要目标骨架 (Y)")
+
+    # 1. 一次映射解析
+    with _Timer(report, "resolve"):
+        if resolved is None:
+            resolved = resolve(job["x_preset"], job["y_preset"], source_arm)
+        plan = resolved.plan
+        if meshes is None and steps & {"convert", "rename"}:
+            meshes = scene_index.get_deformed_meshes(source_arm)
+        physics = find_physics_bones(source_arm, plan) if "graft" in steps else []
+
+    # 2. 目标骨架：snap + graft 共用一次编辑会话
+    if steps & {"snap", "graft"}:
+        with _Timer(report, "bones_target"):
+            with edit_session.edit_armature(target_arm, context) as edit_bones:
+                if "snap" in steps:
+                    report.results["snap"] = snap_bones(
+                        edit_bones, source_arm, target_arm, resolved.analysis_x, plan)
+                if "graft" in steps:
+                    report.results["graft"] = graft_physics_bones(
+                        edit_bones, source_arm, target_arm, plan, physics) if physics else 0
+
+    # 3. 每个网格一次权重重映射 (rename 删除辅助骨之前必须先合并其权重)
+    if steps & {"convert", "rename"}:
+        with _Timer(report, "weights"):
+            edit_session.ensure_object_mode(context)
+            weight_limit = plan.weight_limit if job.get("limit_weights", False) else None
+            report.results["convert"] = convert_mesh_weights(meshes, plan, weight_limit)
+
+    # 4. 源骨架：rename
+    if "rename" in steps:
+        with _Timer(report, "bones_source"):
+            with edit_session.edit_armature(source_arm, context) as edit_bones:
+                report.results["rename"] = rename_bones_to_target(edit_bones, resolved.analysis_x, plan)
+
+    return report
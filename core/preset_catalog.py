@@ -0,0 +1,151 @@
+import os
+from . import bone_mapper
+
+# 预设目录清单缓存
+# subdir -> {"mtime": 目录修改时间, "entries": [PresetEntry], "items": EnumProperty items}
+# 只在目录 mtime 变化或显式失效 (编辑器保存/删除) 时重新扫描；
+# 返回给 EnumProperty 的 items 列表也由这里持有引用，避免字符串被回收
+_catalogs = {}
+
+class PresetEntry:
+    """单个预设文件的元数据 (来自 preset_info，扫描时读取一次)"""
+    __slots__ = ("filename", "filepath", "display_name", "preset_info")
+
+    def __init__(self, filename, filepath, preset_info):
+        self.filename = filename
+        self.filepath = filepath
+        # identifier 用文件名，name 去掉后缀 (不同文件的 preset_info.name 可能重复)
+        self.display_name = filename.replace("_preset.json", "").replace(".json", "").upper()
+        self.preset_info = preset_info
+
+    @property
+    def description(self):
+        name = self.preset_info.get("name")
+        desc = self.preset_info.get("description")
+        if name and desc:
+            return f"{name}: {desc}"
+        return name or desc or f"加载 {self.filename} 预设"
+
+def get_preset_dir(subdir):
+    """subdir: "import_presets" 或 "bone_presets" """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(current_dir)
+    return os.path.join(root_dir, "assets", subdir)
+
+def _scan(preset_dir):
+    entries = []
+    for f in sorted(os.listdir(preset_dir)):
+        if not f.endswith('.json'):
+            continue
+        filepath = os.path.join(preset_dir, f)
+        try:
+            preset_info = bone_mapper.load_preset_file(filepath).preset_info
+        except Exception as e:
+            print(f"[Error] Failed to read preset {f}: {e}")
+            preset_info = {}
+        entries.append(PresetEntry(f, filepath, preset_info))
+    return entries
+
+def get_catalog(subdir):
+    """返回目录下所有预设的 PresetEntry 列表 (带缓存)"""
+    return _get(subdir)["entries"]
+
+def get_preset_items(subdir):
+    """EnumProperty items (带缓存)"""
+    return _get(subdir)["items"]
+
+def _get(subdir):
+    preset_dir = get_preset_dir(subdir)
+    try:
+        mtime = os.stat(preset_dir).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    cached = _catalogs.get(subdir)
+    if cached and cached["mtime"] == mtime:
+        return cached
+
+    if mtime is None:
+        entries = []
+        items = [('NONE', "未找到文件夹", "请检查 assets 目录")]
+    else:
+        entries = _scan(preset_dir)
+        items = [(e.filename, e.display_name, e.description) for e in entries]
+        if not items:
+            items = [('NONE', "无预设文件", "")]
+
+    cached = {"mtime": mtime, "entries": entries, "items": items}
+    _catalogs[subdir] = cached
+    return cached
+
+def invalidate(subdir=None):
+    """预设被保存/删除后调用；不传 subdir 则全部失效"""
+    if subdir is None:
+        _catalogs.clear()
+    else:
+        _catalogs.pop(subdir, None)
+
+# --- 来源预设自动识别 ---
+# 所有 import_presets 共用一张倒排索引：骨骼名 -> [(预设文件名, std_key)]
+# 只依赖主骨候选 (aux 辅助骨在各预设间重复度高，区分度低)
+_detect_cache = {"catalog": None, "index": {}, "key_counts": {}}
+
+# 最佳与次选的得分差小于该值时视为无法区分 (例如 dmc5 / mhrs 的骨骼名几乎相同，得分只差 0.02)，
+# 自动识别不改动当前选择
+DETECT_MARGIN = 0.05
+
+def _get_detect_index():
+    catalog = _get("import_presets")
+    if _detect_cache["catalog"] is catalog:
+        return _detect_cache["index"], _detect_cache["key_counts"]
+
+    index = {}
+    key_counts = {}
+    for entry in catalog["entries"]:
+        try:
+            mapping_data = bone_mapper.load_preset_file(entry.filepath).mapping_data
+        except Exception:
+            continue
+        keys = 0
+        for std_key, mapping in mapping_data.items():
+            mains = mapping.get("main", [])
+            if not mains:
+                continue
+            keys += 1
+            for name in mains:
+                index.setdefault(name, []).append((entry.filename, std_key))
+        if keys:
+            key_counts[entry.filename] = keys
+
+    _detect_cache.update(catalog=catalog, index=index, key_counts=key_counts)
+    return index, key_counts
+
+def detect_source_preset(bone_names):
+    """
+    一次遍历骨骼名，为所有来源预设打分
+    得分 = 命中的标准骨骼数 / 该预设定义的标准骨骼数
+    返回: [(预设文件名, 得分, 命中数)]，按得分从高到低排序；无任何命中时为空列表
+    """
+    index, key_counts = _get_detect_index()
+
+    matched = {}
+    for name in bone_names:
+        for filename, std_key in index.get(name, ()):
+            matched.setdefault(filename, set()).add(std_key)
+
+    ranking = [(filename, len(keys) / key_counts[filename], len(keys))
+               for filename, keys in matched.items()]
+    ranking.sort(key=lambda r: (r[1], r[2]), reverse=True)
+    return ranking
+
+def is_ambiguous(ranking):
+    """最佳与次选的得分差小于 DETECT_MARGIN"""
+    return len(ranking) > 1 and ranking[0][1] - ranking[1][1] < DETECT_MARGIN
+
+def describe_ranking(ranking):
+    """识别结果的说明文字：最佳 (置信度, 命中数) + 次选"""
+    best, confidence, hits = ranking[0]
+    text = f"{best} (置信度 {confidence:.0%}, 命中 {hits} 根)"
+    if len(ranking) > 1:
+        text += f", 次选 {ranking[1][0]} ({ranking[1][1]:.0%})"
+    return text
@@ -0,0 +1,180 @@
+"""
+顶点组重映射计划 (Remap Plan)
+
+把一次转换中所有的 (辅助组 -> 主组) 合并与 (旧名 -> 新名) 重命名，
+先在"组名"层面模拟执行，编译成一张组索引重映射表。
+之后只需对网格权重做一次线性遍历即可应用全部规则。
+
+本模块不依赖 bpy，只处理名字与索引。
+"""
+
+class _Slot:
+    """模拟过程中的一个顶点组：base 为原始组索引 (新建组为 None)，merged 为按顺序并入的原始组索引"""
+    __slots__ = ("name", "base", "merged")
+
+    def __init__(self, name, base):
+        self.name = name
+        self.base = base
+        self.merged = []
+
+class RemapPlan:
+    """
+    编译完成的重映射表
+    group_names: 编译时网格的原始顶点组名 (按索引顺序)
+    slots: 最终保留/新建的顶点组 [(最终名, 原始索引或 None, 并入的原始索引元组)]
+    removed: 需要删除的原始组索引
+    """
+    def __init__(self, group_names, slots, removed):
+        self.group_names = tuple(group_names)
+        self.slots = slots
+        self.removed = removed
+
+    @property
+    def changed(self):
+        """是否会对网格产生任何修改"""
+        if self.removed:
+            return True
+        for name, base, merged in self.slots:
+            if base is None or merged or name != self.group_names[base]:
+                return True
+        return False
+
+    def index_table(self):
+        """
+        组索引重映射表
+        返回: (dest, rank) 两个列表，长度等于原始组数
+        dest[i]: 原始组 i 的权重流向的 slot 序号 (-1 表示丢弃)
+        rank[i]: 在该 slot 内的叠加顺序 (0 为主组自身)
+        """
+        dest = [-1] * len(self.group_names)
+        rank = [0] * len(self.group_names)
+        for k, (_, base, merged) in enumerate(self.slots):
+            if base is not None:
+                dest[base] = k
+            for j, m in enumerate(merged):
+                dest[m] = k
+                rank[m] = j + 1
+        return dest, rank
+
+class RemapPlanBuilder:
+    """按顺序记录合并/重命名操作，语义与逐条执行 vertex_groups 操作一致"""
+
+    def __init__(self, group_names):
+        self.group_names = list(group_names)
+        self.live = {name: _Slot(name, i) for i, name in enumerate(self.group_names)}
+
+    def has(self, name):
+        return name in self.live
+
+    def merge(self, main_name, aux_names):
+        """辅助组并入主组 (主组不存在时新建)，辅助组随后被删除"""
+        if main_name not in self.live:
+            self.live[main_name] = _Slot(main_name, None)
+        target = self.live[main_name]
+
+        for aux in dict.fromkeys(aux_names):
+            if aux == main_name or aux not in self.live:
+                continue
+            source = self.live.pop(aux)
+            if source.base is not None:
+                target.merged.append(source.base)
+            target.merged.extend(source.merged)
+
+    def rename(self, old_name, new_name):
+        """重命名；若新名已被占用，则先删除占用者 (与 DirectConvert 的旧逻辑一致)"""
+        if old_name == new_name or old_name not in self.live:
+            return
+        self.live.pop(new_name, None)
+        slot = self.live.pop(old_name)
+        slot.name = new_name
+        self.live[new_name] = slot
+
+    def build(self):
+        slots = [(s.name, s.base, tuple(s.merged)) for s in self.live.values()]
+        kept = {s.base for s in self.live.values() if s.base is not None}
+        removed = [i for i in range(len(self.group_names)) if i not in kept]
+        return RemapPlan(self.group_names, slots, removed)
+
+# --- 编译入口 ---
+
+def compile_standard_x(group_names, analysis):
+    """
+    标准化 X 的合并计划
+    analysis: {std_key: (main_name, aux_list)}
+    """
+    builder = RemapPlanBuilder(group_names)
+    for std_key, (main_name, aux_list) in analysis.items():
+        if aux_list:
+            # 没找到主骨名时，使用标准名作为目标顶点组，方便后续手动处理
+            builder.merge(main_name if main_name else std_key, aux_list)
+    return builder.build()
+
+def compile_conversion(group_names, conversion_rules):
+    """
+    X -> Y 直接转换的计划
+    conversion_rules: [(源主名候选列表, 源辅助名列表, 目标主名)]
+    """
+    builder = RemapPlanBuilder(group_names)
+    for src_mains, src_auxs, tgt_name in conversion_rules:
+        # 网格上实际存在的第一个源主组
+        real_src_main = next((c for c in src_mains if builder.has(c)), None)
+
+        # 有源主组 -> 合并到源主组 (稍后改名)；无源主组 -> 直接合并到目标名
+        target_vg = real_src_main if real_src_main else tgt_name
+
+        real_auxs = [aux for aux in src_auxs if builder.has(aux)]
+        if real_auxs:
+            builder.merge(target_vg, real_auxs)
+
+        if real_src_main and real_src_main != tgt_name:
+            builder.rename(real_src_main, tgt_name)
+    return builder.build()
+
+# --- 计划缓存 ---
+# 同一角色的多个网格 (按材质拆分的部件、LOD) 常有完全相同且顺序一致的顶点组名，
+# 编译结果只取决于组名列表与规则，因此按组名签名复用，只有第一个网格需要做名字匹配。
+# 缓存的 RemapPlan 只读共享，不要修改。
+
+def group_signature(group_names):
+    """有序顶点组名的签名 (哈希)"""
+    return hash(tuple(group_names))
+
+class PlanCache:
+    """组名签名 -> RemapPlan；命中时再比对完整组名，防止哈希碰撞"""
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._plans = {}
+
+    def get(self, group_names, compile_fn):
+        names = tuple(group_names)
+        signature = group_signature(names)
+        plan = self._plans.get(signature)
+        if plan is not None and plan.group_names == names:
+            return plan
+
+        if len(self._plans) >= self.max_size:
+            self._plans.clear()
+        plan = compile_fn(names)
+        self._plans[signature] = plan
+        return plan
+
+    def clear(self):
+        self._plans.clear()
+
+# 标准化 X：匹配结果 (由 X 预设与骨架决定) -> PlanCache
+_standard_x_caches = {}
+_MAX_ANALYSES = 16
+
+def _analysis_key(analysis):
+    return tuple((std_key, main_name, tuple(aux_list))
+                 for std_key, (main_name, aux_list) in analysis.items())
+
+def compile_standard_x_cached(group_names, analysis):
+    """compile_standard_x 的缓存版本 (同一份匹配结果 + 相同组名签名时直接复用)"""
+    key = _analysis_key(analysis)
+    cache = _standard_x_caches.get(key)
+    if cache is None:
+        if len(_standard_x_caches) >= _MAX_ANALYSES:
+            _standard_x_caches.clear()
+        cache = _standard_x_caches[key] = PlanCache()
+    return cache.get(group_names, lambda names: compile_standard_x(names, analysis))
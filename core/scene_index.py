@@ -0,0 +1,115 @@
+import bpy
+from bpy.app.handlers import persistent
+
+# 骨架 -> 受其形变的网格 的反向索引
+# 首次查询时扫描一次 bpy.data.objects，之后查询为 O(1)
+# 只在撤销/重做、打开文件、物体数量变化时整体失效；
+# 编辑/动画带来的几何更新不会清空索引，只核对被更新网格的形变骨架是否真的变了
+# 查询时再逐个核对缓存条目 (仍是网格、修改器目标仍是该骨架)，不符则重建；
+# 查询的骨架没有条目时，再逐个核对网格的形变骨架集合，以发现新绑定的网格
+# 局限：脚本给已有条目的骨架新增绑定 (添加 Armature 修改器 / 骨架父级) 后，
+# 在下一次 depsgraph 更新之前立即查询，查不到新绑定的网格；此类脚本应先调用 invalidate()
+_armature_meshes = None
+_mesh_armatures = {}
+_object_count = -1
+
+def _deforming_armatures(obj):
+    """
+    形变该物体的骨架：全部 Armature 修改器目标 + 骨架父级 (PARSKEL)
+    与 Object.find_armature() (只返回第一个) 不同，多个 Armature 修改器时每个骨架都能查到该网格
+    """
+    for m in obj.modifiers:
+        if m.type == 'ARMATURE' and m.object:
+            yield m.object
+    if obj.parent and obj.parent.type == 'ARMATURE' and obj.parent_type == 'ARMATURE':
+        yield obj.parent
+
+def _armature_key(obj):
+    """网格的形变骨架集合 (指针)，用于判断索引条目是否过期"""
+    return frozenset(arm.as_pointer() for arm in _deforming_armatures(obj))
+
+def _build_index():
+    global _armature_meshes, _mesh_armatures, _object_count
+    index = {}
+    mesh_armatures = {}
+    for obj in bpy.data.objects:
+        if obj.type != 'MESH':
+            continue
+        key = _armature_key(obj)
+        mesh_armatures[obj.as_pointer()] = key
+        for arm in key:
+            index.setdefault(arm, []).append(obj)
+    _armature_meshes = index
+    _mesh_armatures = mesh_armatures
+    _object_count = len(bpy.data.objects)
+
+def invalidate():
+    """手动使索引失效"""
+    global _armature_meshes, _mesh_armatures
+    _armature_meshes = None
+    _mesh_armatures = {}
+
+def _bindings_changed():
+    """逐个核对网格的形变骨架集合是否与建索引时一致 (不建新索引，只比较)"""
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and _mesh_armatures.get(obj.as_pointer(), frozenset()) != _armature_key(obj):
+            return True
+    return False
+
+def _is_current(obj, armature_obj):
+    """缓存条目仍然有效：物体未删除、仍是网格、仍受该骨架形变"""
+    try:
+        return obj.type == 'MESH' and any(arm == armature_obj for arm in _deforming_armatures(obj))
+    except ReferenceError:
+        return False
+
+def get_deformed_meshes(armature_obj):
+    """返回受该骨架形变的所有网格物体 (列表副本)"""
+    if _armature_meshes is None or _object_count != len(bpy.data.objects):
+        _build_index()
+
+    meshes = list(_armature_meshes.get(armature_obj.as_pointer(), ()))
+    if not all(_is_current(obj, armature_obj) for obj in meshes) or (not meshes and _bindings_changed()):
+        # 索引过期 (物体已删除、修改器目标已改，或有网格新绑定到该骨架)，重建一次
+        _build_index()
+        meshes = list(_armature_meshes.get(armature_obj.as_pointer(), ()))
+    return meshes
+
+# --- 失效处理 ---
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    if _armature_meshes is None:
+        return
+    for update in depsgraph.updates:
+        if not (isinstance(update.id, bpy.types.Object) and update.is_updated_geometry):
+            continue
+        obj = update.id.original
+        if obj.type != 'MESH':
+            continue
+        # 只有新增/移除 Armature 修改器、改目标或改骨架父级时才失效，普通编辑与动画不影响
+        if _mesh_armatures.get(obj.as_pointer(), frozenset()) != _armature_key(obj):
+            invalidate()
+            return
+
+@persistent
+def _on_undo_redo_load(*args):
+    invalidate()
+
+_handlers = [
+    (bpy.app.handlers.depsgraph_update_post, _on_depsgraph_update),
+    (bpy.app.handlers.undo_post, _on_undo_redo_load),
+    (bpy.app.handlers.redo_post, _on_undo_redo_load),
+    (bpy.app.handlers.load_post, _on_undo_redo_load),
+]
+
+def register():
+    for handler_list, func in _handlers:
+        if func not in handler_list:
+            handler_list.append(func)
+
+def unregister():
+    for handler_list, func in _handlers:
+        if func in handler_list:
+            handler_list.remove(func)
+    invalidate()
@@ -1,6 +1,50 @@
-import bpy, mathutils
+import bpy
 from .bone_mapper import BoneMapManager, STANDARD_BONE_NAMES
-from . import weight_utils, bone_utils
+from . import weight_utils, remap_plan, scene_index, conversion_plan, preset_catalog, edit_session, pipeline
+
+# --- 来源预设自动识别 ---
+# 同一骨架 (骨骼名不变) 在预设目录不变时只识别一次，各转换入口重复调用时直接跳过
+_detected = {"key": None, "catalog": None}
+
+def _is_detected(arm_obj):
+    return (_detected["catalog"] is preset_catalog.get_catalog("import_presets")
+            and _detected["key"] == (arm_obj.data.as_pointer(), hash(tuple(arm_obj.data.bones.keys()))))
+
+def _mark_detected(arm_obj):
+    _detected.update(key=(arm_obj.data.as_pointer(), hash(tuple(arm_obj.data.bones.keys()))),
+                     catalog=preset_catalog.get_catalog("import_presets"))
+
+def _set_source_preset(settings, filename, ranking):
+    settings.import_preset_detected = filename  # 先记录，update 回调据此区分自动/手动
+    settings.import_preset_enum = filename
+    settings.import_preset_detect_info = "识别: " + preset_catalog.describe_ranking(ranking)
+    settings.import_preset_ambiguous = preset_catalog.is_ambiguous(ranking)
+
+def auto_detect_source_preset(operator, context, arm_obj):
+    """
+    转换入口调用：未手动选择来源预设时，按源骨架的骨骼名自动选择并报告置信度与次选
+    最佳与次选无法区分 (preset_catalog.is_ambiguous) 时保留当前选择并给出警告
+    """
+    settings = context.scene.mhw_suite_settings
+    if not settings.import_preset_auto or arm_obj is None or arm_obj.type != 'ARMATURE':
+        return
+    if _is_detected(arm_obj):
+        return
+    _mark_detected(arm_obj)
+
+    ranking = preset_catalog.detect_source_preset(arm_obj.data.bones.keys())
+    if not ranking:
+        return
+    if preset_catalog.is_ambiguous(ranking):
+        settings.import_preset_detect_info = "无法区分: " + preset_catalog.describe_ranking(ranking)
+        settings.import_preset_ambiguous = True
+        operator.report({'WARNING'}, f"来源预设识别结果接近 ({preset_catalog.describe_ranking(ranking)})，"
+                                     f"保留当前选择 {settings.import_preset_enum}")
+        return
+    changed = ranking[0][0] != settings.import_preset_enum
+    _set_source_preset(settings, ranking[0][0], ranking)
+    if changed:
+        operator.report({'INFO'}, f"已自动选择来源预设 {preset_catalog.describe_ranking(ranking)}")
 
 class MODDER_OT_ApplyStandardX(bpy.types.Operator):
     """执行标准化 X：合并权重并重命名为基础名"""
@@ -11,6 +55,7 @@ class MODDER_OT_ApplyStandardX(bpy.types.Operator):
     def execute(self, context):
         settings = context.scene.mhw_suite_settings 
         arm_obj = context.active_object
+        auto_detect_source_preset(self, context, arm_obj)
         
         # 1. 加载预设
         mapper = BoneMapManager()
@@ -18,42 +63,43 @@ class MODDER_OT_ApplyStandardX(bpy.types.Operator):
             self.report({'ERROR'}, "预设加载失败")
             return {'CANCELLED'}
 
-        # 2. 匹配分析
-        analysis = {}
-        for std_key in STANDARD_BONE_NAMES:
-            main, auxs = mapper.get_matches_for_standard(arm_obj, std_key)
-            if main or auxs: analysis[std_key] = (main, auxs)
-
-        # 3. 权重合并
-        meshes = [o for o in bpy.data.objects if o.type == 'MESH' and o.find_armature() == arm_obj]
-        bpy.ops.object.mode_set(mode='OBJECT')
-        for mesh_obj in meshes:
-            for std_key, (main_name, aux_list) in analysis.items():
-                if aux_list:
-                    # 没找到主骨名时，使用标准名作为目标顶点组，方便后续手动处理
-                    target_vg = main_name if main_name else std_key
-                    weight_utils.merge_vgroups_to_main(mesh_obj, target_vg, aux_list)
+        # 2. 匹配分析 (一次遍历骨架的全部骨骼)
+        analysis = mapper.analyze_armature(arm_obj)
+
+        # 3. 权重合并 (影响数限制取当前所选 Y 预设的 weight_limit)
+        weight_limit = None
+        if settings.apply_weight_limit:
+            mapper_y = BoneMapManager()
+            if mapper_y.load_preset(settings.target_preset_enum, is_import_x=False):
+                weight_limit = mapper_y.preset.weight_limit
+
+        meshes = scene_index.get_deformed_meshes(arm_obj)
+        edit_session.ensure_object_mode(context)
+        items = []
+        for mesh_obj, _ in weight_utils.group_shared_meshes(meshes):
+            # 所有合并先编译成一张重映射表，再对网格权重做一次遍历 (共享网格数据的物体只处理一次)
+            plan = remap_plan.compile_standard_x_cached(mesh_obj.vertex_groups.keys(), analysis)
+            if plan.changed or weight_limit:
+                items.append((mesh_obj, plan))
+        weight_utils.apply_remap_plans(items, weight_limit)
 
         # 4. 骨骼重命名 (Edit Mode)
-        bpy.ops.object.mode_set(mode='EDIT')
-        edit_bones = arm_obj.data.edit_bones
-        
         rename_count = 0
         deleted_count = 0
         
-        for std_key, (main_name, aux_list) in analysis.items():
-            # 只有当主骨存在时，才执行重命名
-            if main_name and main_name in edit_bones:
-                edit_bones[main_name].name = std_key
-                rename_count += 1
-            
-            # 无论主骨是否存在，辅助骨都要清理 (因为权重已经转移了)
-            for aux_name in aux_list:
-                if aux_name in edit_bones:
-                    edit_bones.remove(edit_bones[aux_name])
-                    deleted_count += 1
+        with edit_session.edit_armature(arm_obj, context) as edit_bones:
+            for std_key, (main_name, aux_list) in analysis.items():
+                # 只有当主骨存在时，才执行重命名
+                if main_name and main_name in edit_bones:
+                    edit_bones[main_name].name = std_key
+                    rename_count += 1
+                
+                # 无论主骨是否存在，辅助骨都要清理 (因为权重已经转移了)
+                for aux_name in aux_list:
+                    if aux_name in edit_bones:
+                        edit_bones.remove(edit_bones[aux_name])
+                        deleted_count += 1
 
-        bpy.ops.object.mode_set(mode='OBJECT')
         self.report({'INFO'}, f"标准化完成: 重命名 {rename_count} 根, 清理 {deleted_count} 根辅助骨")
         return {'FINISHED'}
 
@@ -71,15 +117,13 @@ class MODDER_OT_ApplyStandardY(bpy.types.Operator):
         if not mapper.load_preset(settings.target_preset_enum, is_import_x=False):
             return {'CANCELLED'}
 
-        bpy.ops.object.mode_set(mode='EDIT')
-        edit_bones = arm_obj.data.edit_bones
-        for std_key in STANDARD_BONE_NAMES:
-            if std_key in edit_bones:
-                target_data = mapper.mapping_data.get(std_key)
-                if target_data and target_data.get("main"):
-                    edit_bones[std_key].name = target_data["main"][0]
+        with edit_session.edit_armature(arm_obj, context) as edit_bones:
+            for std_key in STANDARD_BONE_NAMES:
+                if std_key in edit_bones:
+                    target_data = mapper.mapping_data.get(std_key)
+                    if target_data and target_data.get("main"):
+                        edit_bones[std_key].name = target_data["main"][0]
 
-        bpy.ops.object.mode_set(mode='OBJECT')
         return {'FINISHED'}
     
 class MODDER_OT_DirectConvert(bpy.types.Operator):
@@ -97,6 +141,9 @@ class MODDER_OT_DirectConvert(bpy.types.Operator):
         if not selected_meshes:
             self.report({'ERROR'}, "请至少选中一个网格 (Mesh)")
             return {'CANCELLED'}
+        active = context.active_object
+        auto_detect_source_preset(self, context, active if active and active.type == 'ARMATURE'
+                                  else selected_meshes[0].find_armature())
 
         # 2. 加载映射表
         mapper_x = BoneMapManager()
@@ -109,79 +156,57 @@ class MODDER_OT_DirectConvert(bpy.types.Operator):
             self.report({'ERROR'}, "无法加载 Y 预设")
             return {'CANCELLED'}
 
-        # 3. 预计算转换规则
-        # 需要知道：标准键 -> (源主名, 源辅助列表, 目标主名)
-        conversion_rules = []
-        
-        for std_key in STANDARD_BONE_NAMES:
-            # A. 从 X 表获取源信息
-            src_entry = mapper_x.mapping_data.get(std_key)
-            if not src_entry: continue
-            
-            src_mains = src_entry.get("main", [])
-            src_auxs = src_entry.get("aux", [])
-            
-            # B. 从 Y 表获取目标信息
-            tgt_entry = mapper_y.mapping_data.get(std_key)
-            if not tgt_entry: continue
-            tgt_mains = tgt_entry.get("main", [])
-            
-            if src_mains and tgt_mains:
-                # 规则：(源主名列表, 源辅助名列表, 目标主名)
-                # 取第一个目标主名作为最终名字
-                conversion_rules.append((src_mains, src_auxs, tgt_mains[0]))
+        # 3. 转换规则 (由 X/Y 预设对共享的转换计划提供，已记忆化)
+        # 规则：(源主名列表, 源辅助名列表, 目标主名)
+        plan = conversion_plan.get_conversion_plan(mapper_x.preset, mapper_y.preset)
+        conversion_rules = plan.conversion_rules
 
         if not conversion_rules:
             self.report({'WARNING'}, "X与Y预设之间没有共同的骨骼映射")
             return {'CANCELLED'}
 
         # 4. 开始处理网格 (Object Mode)
-        bpy.ops.object.mode_set(mode='OBJECT')
+        edit_session.ensure_object_mode(context)
         
-        processed_count = 0
-        
-        for mesh_obj in selected_meshes:
-            vgs = mesh_obj.vertex_groups
-            mesh_updated = False
-            
-            for src_mains, src_auxs, tgt_name in conversion_rules:
-                # 步骤 A: 确定当前网格上实际存在哪个“源主顶点组”
-                # (X预设里 main 可能有多个候选，如 ["UpperArm_L", "Left Arm"]，我们要找 Mesh 上有的那个)
-                real_src_main = None
-                for candidate in src_mains:
-                    if candidate in vgs:
-                        real_src_main = candidate
-                        break
-                
-                # 如果没找到主组，跳过此骨骼（可能这个网格只是个手套，没有腿骨权重）
-                # if not real_src_main:
-                #     continue
-                
-                # 确定权重的去向：
-                # 有 源主组 -> 合并到源主组 (稍后改名)
-                # 无 源主组 -> 直接合并到目标名 (tgt_name)
-                target_vg = real_src_main if real_src_main else tgt_name
-
-                # 步骤 B: 合并辅助权重
-                # 找出当前网格上实际存在的辅助组
-                real_auxs = [aux for aux in src_auxs if aux in vgs]
-                if real_auxs:
-                    weight_utils.merge_vgroups_to_main(mesh_obj, target_vg, real_auxs)
-                    mesh_updated = True
-                
-                # 步骤 C: 重命名主顶点组 -> 目标名
-                # 只有当名字不同时才改名，防止报错
-                if real_src_main and real_src_main != tgt_name:
-                    if tgt_name in vgs: vgs.remove(vgs[tgt_name])
-                    vgs[real_src_main].name = tgt_name
-                    mesh_updated = True
-            
-            if mesh_updated:
-                processed_count += 1
+        # 规则在组名层面模拟执行，编译成一张重映射表，再一次遍历应用
+        # (主组选取、辅助组合并、改名覆盖的语义与逐条执行一致)
+        # 合并的同一次遍历中按 Y 预设限制影响数并归一化 (可在面板关闭)
+        weight_limit = plan.weight_limit if settings.apply_weight_limit else None
+        processed_count = pipeline.convert_mesh_weights(selected_meshes, plan, weight_limit)
 
         self.report({'INFO'}, f"处理完成: 已更新 {processed_count} 个网格的顶点组")
         return {'FINISHED'}
     
+class MODDER_OT_DetectSourcePreset(bpy.types.Operator):
+    """根据当前骨架的骨骼名自动识别来源预设 (X)"""
+    bl_idname = "modder.detect_source_preset"
+    bl_label = "自动识别来源预设"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        settings = context.scene.mhw_suite_settings
+        arm_obj = context.active_object
+        if not arm_obj or arm_obj.type != 'ARMATURE':
+            self.report({'ERROR'}, "请先选中一个骨架")
+            return {'CANCELLED'}
+
+        ranking = preset_catalog.detect_source_preset(arm_obj.data.bones.keys())
+        if not ranking:
+            self.report({'WARNING'}, "没有任何来源预设与该骨架匹配")
+            return {'CANCELLED'}
+
+        # 手动点击：直接采用最佳结果，并重新开启自动识别
+        _set_source_preset(settings, ranking[0][0], ranking)
+        settings.import_preset_auto = True
+        _mark_detected(arm_obj)
+        
+        msg = "识别为 " + preset_catalog.describe_ranking(ranking)
+        if settings.import_preset_ambiguous:
+            msg += "，与次选得分接近，请确认"
+        self.report({'INFO'} if ranking[0][1] >= 0.5 and not settings.import_preset_ambiguous
+                    else {'WARNING'}, msg)
+        return {'FINISHED'}
+
 class MODDER_OT_UniversalSnap(bpy.types.Operator):
     """将目标游戏骨架的身体骨骼对齐来源预设骨骼（后选要修改的目标骨架）"""
     bl_idname = "modder.universal_snap"
@@ -199,6 +224,7 @@ class MODDER_OT_UniversalSnap(bpy.types.Operator):
             
         target_arm = context.active_object  # 活动的是目标 (Y, 如 MHWI)
         source_arm = [o for o in selected_objs if o != target_arm][0] # 另一个是源 (X, 如 VRC)
+        auto_detect_source_preset(self, context, source_arm)
         
         # 2. 加载映射表
         mapper_x = BoneMapManager()
@@ -211,65 +237,13 @@ class MODDER_OT_UniversalSnap(bpy.types.Operator):
             self.report({'ERROR'}, "无法加载 Y 预设")
             return {'CANCELLED'}
 
-        # 3. 预计算源骨骼的世界坐标 (在 Object 模式下进行)
-        # 结构: { StandardName: Source_Head_World_Pos }
-        source_positions = {} 
-        source_mw = source_arm.matrix_world
-        
-        for std_key in STANDARD_BONE_NAMES:
-            src_name, _ = mapper_x.get_matches_for_standard(source_arm, std_key)
-            if src_name:
-                try:
-                    b = source_arm.data.bones[src_name]
-                    # 我们只需要头部坐标即可，尾部会通过刚性移动自动计算
-                    source_positions[std_key] = source_mw @ b.head_local
-                except KeyError:
-                    pass
-
-        # 4. 进入编辑模式执行对齐
-        bpy.ops.object.mode_set(mode='EDIT')
-        edit_bones = target_arm.data.edit_bones
-        target_mw_inv = target_arm.matrix_world.inverted()
-        
-        aligned_count = 0
-        
-        # 按 STANDARD_BONE_NAMES 的顺序遍历 (通常是 Hips -> Spine -> Head)
-        # 这样父级移动后，子级会先跟随移动，然后子级再根据自己的目标进行微调
-        for std_key in STANDARD_BONE_NAMES:
-            if std_key not in source_positions:
-                continue
-                
-            # 获取目标骨名 (从 Y 表)
-            tgt_entry = mapper_y.mapping_data.get(std_key)
-            if not tgt_entry or not tgt_entry.get('main'):
-                continue
-                
-            tgt_name = tgt_entry['main'][0]
-            if tgt_name not in edit_bones:
-                continue
-                
-            t_bone = edit_bones[tgt_name]
-            
-            # --- 核心对齐逻辑 ---
-            
-            # A. 计算目标点 (转为 Target 本地坐标)
-            src_head_world = source_positions[std_key]
-            target_head_local = target_mw_inv @ src_head_world
-            
-            # B. 计算移动向量
-            old_head = t_bone.head.copy()
-            offset = target_head_local - old_head
-            
-            # C. 移动当前骨骼 (保持长度和方向)
-            t_bone.head = target_head_local
-            t_bone.tail += offset # 尾部跟随移动，保持骨骼向量不变
-            
-            # D. 刚性传递：递归移动所有子级
-            bone_utils.propagate_movement(t_bone, offset)
-            
-            aligned_count += 1
+        plan = conversion_plan.get_conversion_plan(mapper_x.preset, mapper_y.preset)
+
+        # 3. 源骨骼位置批量转换到目标骨架本地坐标，在编辑模式内执行对齐
+        analysis_x = mapper_x.analyze_armature(source_arm)
+        with edit_session.edit_armature(target_arm, context) as edit_bones:
+            aligned_count = pipeline.snap_bones(edit_bones, source_arm, target_arm, analysis_x, plan)
         
-        bpy.ops.object.mode_set(mode='OBJECT')
         self.report({'INFO'}, f"刚性对齐完成: {aligned_count} 根骨骼")
         return {'FINISHED'}
     
@@ -305,170 +279,97 @@ class MODDER_OT_SmartGraftBones(bpy.types.Operator):
             return {'CANCELLED'}
 
         # --- 2. 加载预设 (仅用于排除非物理骨) ---
-        from .bone_mapper import BoneMapManager
-        mapper = BoneMapManager()
         settings = context.scene.mhw_suite_settings
+        auto_detect_source_preset(self, context, source_arm)
         
-        if not mapper.load_preset(settings.import_preset_enum, is_import_x=True):
+        mapper_x = BoneMapManager()
+        if not mapper_x.load_preset(settings.import_preset_enum, is_import_x=True):
             self.report({'ERROR'}, "无法加载源预设 (In)")
             return {'CANCELLED'}
-        src_data = mapper.mapping_data 
 
-        if not mapper.load_preset(settings.target_preset_enum, is_import_x=False):
+        mapper_y = BoneMapManager()
+        if not mapper_y.load_preset(settings.target_preset_enum, is_import_x=False):
             self.report({'ERROR'}, "无法加载目标预设 (Out)")
             return {'CANCELLED'}
-        tgt_data = mapper.mapping_data
 
-        # --- 3. 构建查找表 ---
-        src_to_std = {}
-        all_preset_bones_src = set()
-        
-        for std_key, entry in src_data.items():
-            for m in entry.get('main', []):
-                src_to_std[m] = std_key
-                all_preset_bones_src.add(m)
-            for a in entry.get('aux', []):
-                src_to_std[a] = std_key 
-                all_preset_bones_src.add(a)
-
-        std_to_tgt_bone = {}
-        for std_key, entry in tgt_data.items():
-            mains = entry.get('main', [])
-            if mains:
-                std_to_tgt_bone[std_key] = mains[0]
+        # --- 3. 转换计划 (共享) ---
+        plan = conversion_plan.get_conversion_plan(mapper_x.preset, mapper_y.preset)
 
         # --- 4. 筛选物理骨 ---
-        # 只要不在预设里的，都算物理骨
-        physics_bones_names = [b.name for b in source_arm.data.bones if b.name not in all_preset_bones_src]
-        physics_bones_set = set(physics_bones_names) # 用于快速查找
+        physics_bones_names = pipeline.find_physics_bones(source_arm, plan)
         
         if not physics_bones_names:
             self.report({'WARNING'}, "未检测到物理骨骼")
             return {'FINISHED'}
 
         # --- 5. 核心移植逻辑 ---
-        bpy.context.view_layer.objects.active = target_arm
-        bpy.ops.object.mode_set(mode='EDIT')
-        edit_bones = target_arm.data.edit_bones
-        
-        tgt_mat_inv = target_arm.matrix_world.inverted()
-        import mathutils
+        with edit_session.edit_armature(target_arm, context) as edit_bones:
+            created_count = pipeline.graft_physics_bones(
+                edit_bones, source_arm, target_arm, plan, physics_bones_names)
 
-        created_count = 0
-        new_bones_map = {} # {src_name: new_bone_name}
-        
-        # 临时列表：存储所有新生成的骨骼对象（包括标准物理骨和End骨）以便稍后统一竖直化
-        # 格式: (edit_bone, length_to_use)
-        bones_to_verticalize = []
-
-        # 5.1 第一轮：创建所有基础物理骨
-        for p_name in physics_bones_names:
-            src_bone = source_arm.data.bones.get(p_name)
-            src_pb = source_arm.pose.bones.get(p_name)
-            if not src_bone or not src_pb: continue
-            
-            if p_name in edit_bones:
-                eb = edit_bones[p_name]
-            else:
-                eb = edit_bones.new(p_name)
-            new_bones_map[p_name] = eb.name
-            
-            # 基础定位 (Head)
-            src_world_head = source_arm.matrix_world @ src_pb.head
-            eb.head = tgt_mat_inv @ src_world_head
-            # 暂时随便给个 Tail，稍后会被竖直化覆盖
-            eb.tail = eb.head + mathutils.Vector((0, 0, 0.1))
-            
-            # 加入待处理列表
-            bones_to_verticalize.append((eb, src_bone.length))
+        self.report({'INFO'}, f"移植完成: 处理 {created_count} 根骨骼 (含自动生成的末端骨)")
+        return {'FINISHED'}
 
-        # 5.2 第二轮：检测末端并创建 _End 骨骼
-        # (此时所有基础物理骨已创建，位置对应 Source Head)
-        
-        for p_name in physics_bones_names:
-            src_bone = source_arm.data.bones.get(p_name)
-            
-            # 判断是否是"叶子节点" (在物理骨集合中没有子级)
-            # 注意：只检查物理骨集合内的子级。如果它下面连着非物理骨(极少见)，这里也会视为断开。
-            is_leaf = True
-            for child in src_bone.children:
-                if child.name in physics_bones_set:
-                    is_leaf = False
-                    break
-            
-            if is_leaf:
-                # 这是一个末端骨骼，需要生成 _End
-                end_bone_name = f"{p_name}_End"
-                if end_bone_name in edit_bones:
-                    end_eb = edit_bones[end_bone_name]
-                else:
-                    end_eb = edit_bones.new(end_bone_name)
-                
-                # 【关键逻辑】：End 骨骼的头部 = 原 Source 骨骼的尾部
-                src_pb = source_arm.pose.bones.get(p_name)
-                src_world_tail = source_arm.matrix_world @ src_pb.tail
-                
-                end_eb.head = tgt_mat_inv @ src_world_tail
-                # 暂时给个 Tail
-                end_eb.tail = end_eb.head + mathutils.Vector((0, 0, 0.05))
-                
-                # 建立与父级的连接 (逻辑连接)
-                if p_name in new_bones_map:
-                    end_eb.parent = edit_bones[new_bones_map[p_name]]
-                
-                # 加入待处理列表 (End 骨骼长度固定为 0.05 或其他小数值)
-                bones_to_verticalize.append((end_eb, 0.05))
-
-        # 5.3 第三轮：统一竖直化 (Vertical Reset)
-        # 这一步会覆盖刚才的 Tail 位置
-        for eb, length in bones_to_verticalize:
-            # 强制断连
-            eb.use_connect = False
-            
-            # 竖直化 (保持 Head 不动)
-            # 防止长度为 0
-            safe_length = length if length > 0.001 else 0.05
-            
-            # 简单粗暴：Tail = Head + (0, 0, Length)
-            # 由于断开了连接，这不会影响父子关系中的位置
-            eb.tail = eb.head + mathutils.Vector((0, 0, safe_length))
-            eb.roll = 0
-            
-            created_count += 1
+class MODDER_OT_ConvertPipeline(bpy.types.Operator):
+    """一键流水线：对齐 / 物理骨移植 / 顶点组转换 / 骨骼重命名 (先选源骨架 X，再 Shift 加选目标骨架 Y)"""
+    bl_idname = "modder.convert_pipeline"
+    bl_label = "一键流水线 (X -> Y)"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        # --- 6. 智能重建父级 (仅针对基础物理骨，End骨刚才已处理) ---
-        for src_name, tgt_name in new_bones_map.items():
-            eb = edit_bones.get(tgt_name)
-            src_bone = source_arm.data.bones.get(src_name)
-            
-            if not src_bone or not src_bone.parent: continue
-            
-            src_p_name = src_bone.parent.name
-            target_parent_name = None
-
-            # A. 父级是物理骨
-            if src_p_name in new_bones_map:
-                target_parent_name = new_bones_map[src_p_name]
-            # B. 父级是映射骨 (Main/Aux)
-            elif src_p_name in src_to_std:
-                std_key = src_to_std[src_p_name]
-                if std_key in std_to_tgt_bone:
-                    target_parent_name = std_to_tgt_bone[std_key]
-
-            if target_parent_name and target_parent_name in edit_bones:
-                eb.parent = edit_bones[target_parent_name]
-                eb.use_connect = False 
-
-        bpy.ops.object.mode_set(mode='OBJECT')
-        self.report({'INFO'}, f"移植完成: 处理 {created_count} 根骨骼 (含自动生成的末端骨)")
+    do_snap: bpy.props.BoolProperty(name="对齐骨骼 (Snap)", default=True)
+    do_graft: bpy.props.BoolProperty(name="移植物理骨骼 (Graft)", default=False)
+    do_convert: bpy.props.BoolProperty(name="转换顶点组 (Convert)", default=True)
+    do_rename: bpy.props.BoolProperty(name="源骨架重命名 (Rename)", default=False)
+
+    def execute(self, context):
+        settings = context.scene.mhw_suite_settings
+        selected = [o for o in context.selected_objects if o.type == 'ARMATURE']
+        active = context.active_object
+
+        # 选中两个骨架时：活动的是目标 (Y)，另一个是源 (X)；只选一个骨架时它就是源
+        target_arm = None
+        if len(selected) == 2 and active in selected:
+            target_arm = active
+            source_arm = [o for o in selected if o != active][0]
+        elif len(selected) == 1:
+            source_arm = selected[0]
+        else:
+            self.report({'ERROR'}, "请先选中源骨架(X)，再按住Shift选中目标骨架(Y)")
+            return {'CANCELLED'}
+
+        steps = [name for name, flag in (
+            ("snap", self.do_snap), ("graft", self.do_graft),
+            ("convert", self.do_convert), ("rename", self.do_rename)) if flag]
+        if target_arm is None:
+            steps = [s for s in steps if s not in ("snap", "graft")]
+        if not steps:
+            self.report({'WARNING'}, "没有可执行的步骤")
+            return {'CANCELLED'}
+
+        auto_detect_source_preset(self, context, source_arm)
+        job = {
+            "x_preset": settings.import_preset_enum,
+            "y_preset": settings.target_preset_enum,
+            "steps": steps,
+            "limit_weights": settings.apply_weight_limit,
+        }
+        try:
+            report = pipeline.run_job(job, source_arm, target_arm, context=context)
+        except pipeline.PipelineError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"流水线完成: {report.summary()}")
         return {'FINISHED'}
 
 classes = [
     MODDER_OT_ApplyStandardX,
     MODDER_OT_ApplyStandardY,
     MODDER_OT_DirectConvert,
+    MODDER_OT_DetectSourcePreset,
     MODDER_OT_UniversalSnap,
     MODDER_OT_SmartGraftBones,
+    MODDER_OT_ConvertPipeline,
 ]
 
 def register():
@@ -0,0 +1,224 @@
+"""
+多进程权重计算后端 (超大网格)
+
+顶点 / 组 / 权重三个数组放入 multiprocessing.shared_memory，按顶点区间切分给工作进程；
+每个工作进程在自己的区间上完成 重映射 -> 影响数限制/归一化 -> 差异标记，
+结果写入同样位于共享内存的输出缓冲区，主进程直接以数组视图读取，不做序列化拷贝。
+
+重映射、影响数限制、归一化与差异比较都是逐行独立的，因此按行切分的结果与整体计算完全一致。
+
+主进程中本模块照常作为插件包的子模块导入。工作进程使用 spawn 启动，
+由初始化脚本 (_WORKER_BOOTSTRAP) 只在工作进程内把 core 目录加入 sys.path、
+以顶层模块导入本模块，并登记到包内的模块名下 (上级包用空模块占位)，
+这样反序列化任务时不会执行插件包的 __init__，也就不会导入 bpy；主进程的 sys.path 不受影响。
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+if __package__:
+    from .model import WeightMatrix, group_changes
+else:
+    from model import WeightMatrix, group_changes
+
+# 共享缓冲区布局：名字 -> dtype
+# 输入 (COO，按顶点升序)：verts / groups / weights，长度 nnz
+# 输出：单个区间的结果不会多于其输入条目，因此输出缓冲区与输入等长，
+#       区间 [lo, hi) 的结果写在 [lo, lo + 实际条目数)，每行条目数记在 *_counts
+_INPUTS = {"verts": np.int32, "groups": np.int32, "weights": np.float32}
+_ENTRY_OUTPUTS = {
+    "final_indices": np.int32, "final_data": np.float32, "final_write": np.bool_,
+    "base_indices": np.int32, "base_removed": np.bool_,
+}
+_ROW_OUTPUTS = {"final_counts": np.int64, "base_counts": np.int64}
+
+# 工作进程初始化 (以 exec 执行，只依赖标准库)
+_WORKER_BOOTSTRAP = """
+import importlib, sys, types
+sys.path.insert(0, core_dir)
+kernels = importlib.import_module("weight_kernels")
+parts = module_name.split(".")
+for i in range(1, len(parts)):
+    sys.modules.setdefault(".".join(parts[:i]), types.ModuleType(".".join(parts[:i])))
+sys.modules[module_name] = kernels
+"""
+
+# 进程池跨调用复用 (spawn 启动代价较高)
+_executor = None
+_executor_workers = 0
+
+def get_executor(max_workers=None):
+    global _executor, _executor_workers
+    workers = max_workers or os.cpu_count() or 1
+    if _executor is not None and _executor_workers != workers:
+        shutdown()
+    if _executor is None:
+        bootstrap_globals = {"core_dir": os.path.dirname(os.path.abspath(__file__)),
+                             "module_name": __name__}
+        _executor = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=exec,
+                                        initargs=(_WORKER_BOOTSTRAP, bootstrap_globals))
+        _executor_workers = workers
+    return _executor
+
+def shutdown():
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    _executor_workers = 0
+
+# --- 共享内存 ---
+
+class _Buffers:
+    """一组命名的共享内存数组；allocate 创建 (负责 unlink)，attach 附加 (只 close)"""
+    def __init__(self):
+        self.blocks = {}
+        self.arrays = {}
+
+    def _add(self, name, shm, dtype, length):
+        self.blocks[name] = shm
+        self.arrays[name] = np.ndarray((int(length),), dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def allocate(cls, layout):
+        """layout: {名字: (dtype, 长度)}"""
+        buffers = cls()
+        for name, (dtype, length) in layout.items():
+            size = max(int(length) * np.dtype(dtype).itemsize, 1)
+            buffers._add(name, shared_memory.SharedMemory(create=True, size=size), dtype, length)
+        return buffers
+
+    @classmethod
+    def attach(cls, specs):
+        """specs: {名字: (共享内存名, dtype, 长度)} (见 specs())"""
+        buffers = cls()
+        for name, (shm_name, dtype, length) in specs.items():
+            buffers._add(name, shared_memory.SharedMemory(name=shm_name), dtype, length)
+        return buffers
+
+    def specs(self):
+        return {name: (shm.name, self.arrays[name].dtype.str, len(self.arrays[name]))
+                for name, shm in self.blocks.items()}
+
+    def close(self, unlink=False):
+        self.arrays.clear()
+        for shm in self.blocks.values():
+            shm.close()
+            if unlink:
+                shm.unlink()
+        self.blocks.clear()
+
+# --- 工作进程 ---
+
+def _remap_range(task):
+    """
+    工作进程入口：处理顶点区间 [row_start, row_stop) (对应输入条目 [lo, hi))
+    返回: (lo, 结果条目数, 基准条目数)
+    """
+    specs, table, row_start, row_stop, lo, hi = task
+    buffers = _Buffers.attach(specs)
+    try:
+        a = buffers.arrays
+        n_rows = row_stop - row_start
+        matrix = WeightMatrix.from_coo(a["verts"][lo:hi] - row_start, a["groups"][lo:hi],
+                                       a["weights"][lo:hi], n_rows, table["group_names"])
+
+        final = matrix.reindex(table["dest"], table["slot_names"], table["rank"])
+        limit = table["weight_limit"]
+        if limit:
+            final = final.limit_influences(limit["max_influences"], limit["normalize"], table["columns"])
+        base = matrix.reindex(table["base_dest"], table["slot_names"])
+        write, removed = base.diff_masks(final)
+
+        fn, bn = final.nnz, base.nnz
+        a["final_indices"][lo:lo + fn] = final.indices
+        a["final_data"][lo:lo + fn] = final.data
+        a["final_write"][lo:lo + fn] = write
+        a["final_counts"][row_start:row_stop] = final.row_counts()
+        a["base_indices"][lo:lo + bn] = base.indices
+        a["base_removed"][lo:lo + bn] = removed
+        a["base_counts"][row_start:row_stop] = base.row_counts()
+        return lo, fn, bn
+    finally:
+        buffers.close()
+
+# --- 主进程 ---
+
+def split_rows(verts, n_rows, parts):
+    """按条目数均匀切分，边界对齐到顶点：返回 [(row_start, row_stop, lo, hi)]"""
+    nnz = len(verts)
+    parts = max(1, min(parts, n_rows))
+    bounds = [0]
+    for p in range(1, parts):
+        e = nnz * p // parts
+        row = int(verts[e]) if e < nnz else n_rows
+        bounds.append(max(row, bounds[-1]))
+    bounds.append(n_rows)
+
+    ranges = []
+    for row_start, row_stop in zip(bounds[:-1], bounds[1:]):
+        if row_stop > row_start:
+            lo, hi = np.searchsorted(verts, [row_start, row_stop]).tolist()
+            ranges.append((row_start, row_stop, lo, hi))
+    return ranges
+
+def remap_changes(verts, groups, weights, n_rows, plan, weight_limit=None, columns=None,
+                  max_workers=None):
+    """
+    多进程版 WeightMatrix.remap_changes
+    verts / groups / weights: COO 数组，verts 升序 (bpy_adapters.read_vgroup_weights 的输出)
+    返回: {slot 序号: (需写入的行, 新权重, 需移除的行)}，与单进程结果逐位一致
+    """
+    dest, rank = plan.index_table()
+    base_dest = [-1] * len(plan.group_names)
+    for k, (_, b, _) in enumerate(plan.slots):
+        if b is not None:
+            base_dest[b] = k
+    table = {
+        "group_names": list(plan.group_names),
+        "slot_names": [name for name, _, _ in plan.slots],
+        "dest": dest, "rank": rank, "base_dest": base_dest,
+        "weight_limit": weight_limit,
+        "columns": None if columns is None else np.asarray(columns),
+    }
+
+    nnz = len(verts)
+    layout = {name: (dtype, nnz) for name, dtype in {**_INPUTS, **_ENTRY_OUTPUTS}.items()}
+    layout.update({name: (dtype, n_rows) for name, dtype in _ROW_OUTPUTS.items()})
+    buffers = _Buffers.allocate(layout)
+    try:
+        a = buffers.arrays
+        a["verts"][:] = verts
+        a["groups"][:] = groups
+        a["weights"][:] = weights
+
+        executor = get_executor(max_workers)
+        ranges = split_rows(a["verts"], n_rows, _executor_workers * 2)
+        specs = buffers.specs()
+        results = list(executor.map(_remap_range, [(specs, table, *r) for r in ranges]))
+
+        # 只把有变化的条目取出 (其余结果留在共享内存中，不拷贝)
+        w_rows, w_cols, w_vals, r_rows, r_cols = [], [], [], [], []
+        for (row_start, row_stop, lo, _), (_, fn, bn) in zip(ranges, results):
+            rows = np.arange(row_start, row_stop, dtype=np.int32)
+            f_rows = np.repeat(rows, a["final_counts"][row_start:row_stop])
+            b_rows = np.repeat(rows, a["base_counts"][row_start:row_stop])
+            write = a["final_write"][lo:lo + fn]
+            removed = a["base_removed"][lo:lo + bn]
+            w_rows.append(f_rows[write])
+            w_cols.append(a["final_indices"][lo:lo + fn][write])
+            w_vals.append(a["final_data"][lo:lo + fn][write])
+            r_rows.append(b_rows[removed])
+            r_cols.append(a["base_indices"][lo:lo + bn][removed])
+
+        if not ranges:
+            return {}
+        return group_changes(np.concatenate(w_rows), np.concatenate(w_cols), np.concatenate(w_vals),
+                             np.concatenate(r_rows), np.concatenate(r_cols))
+    finally:
+        buffers.close(unlink=True)
@@ -1,44 +1,32 @@
 import bpy
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import remap_plan, scene_index, weight_kernels
+from .model import WeightMatrix, stream_remap
+from .bpy_adapters import read_vgroup_weights, iter_vgroup_chunks, write_vgroup_weights
 
 def merge_weights_and_delete_bones(armature_obj, bone_pairs):
     """
     bone_pairs: List of (keep_bone_name, delete_bone_name)
     """
     # 1. 找到受该骨架影响的所有网格
-    mesh_objects = [o for o in bpy.data.objects 
-                   if o.type == 'MESH' and 
-                   any(m.type == 'ARMATURE' and m.object == armature_obj for m in o.modifiers)]
+    mesh_objects = scene_index.get_deformed_meshes(armature_obj)
     
-    # 2. 遍历网格处理权重
-    for obj in mesh_objects:
-        # 激活物体以确保修改器操作正常
-        bpy.context.view_layer.objects.active = obj
-        vg = obj.vertex_groups
-        
+    # 2. 直接在数据层合并权重
+    # 不创建修改器、不切换活动物体，因此不会触发修改器栈求值，带形态键的网格也能处理
+    # 共享同一网格数据的物体只处理一次
+    for obj, _ in group_shared_meshes(mesh_objects):
+        builder = remap_plan.RemapPlanBuilder(obj.vertex_groups.keys())
         for keep, delete in bone_pairs:
             # 检查两个组是否都存在于该网格
-            if keep not in vg or delete not in vg:
-                continue
-            
-            # 添加混合修改器
-            mod = obj.modifiers.new(name="TempMerge", type='VERTEX_WEIGHT_MIX')
-            mod.vertex_group_a = keep
-            mod.vertex_group_b = delete
-            mod.mix_mode = 'ADD'
-            mod.mix_set = 'ALL'
-            
-            # 应用修改器
-            try:
-                bpy.ops.object.modifier_apply(modifier=mod.name)
-            except Exception as e:
-                print(f"Warning: Failed to apply modifier on {obj.name}: {e}")
-                # 如果应用失败，移除修改器以防堆积
-                if mod.name in obj.modifiers:
-                    obj.modifiers.remove(mod)
-                continue
-            
-            if delete in vg:
-                vg.remove(vg[delete])
+            if builder.has(keep) and builder.has(delete):
+                builder.merge(keep, [delete])
+        
+        plan = builder.build()
+        if plan.changed:
+            apply_remap_plan(obj, plan)
             
     # 3. 删除骨骼
     bpy.context.view_layer.objects.active = armature_obj
@@ -54,32 +42,271 @@ def merge_weights_and_delete_bones(armature_obj, bone_pairs):
     bpy.ops.object.mode_set(mode='OBJECT')
     print(f"Deleted {deleted_count} bones.")
     
+def group_shared_meshes(objects):
+    """
+    按 (网格数据指针, 顶点组名签名) 分组，保持首次出现的顺序
+    顶点权重 (以及 Blender 3.0 起的顶点组名) 存放在网格数据上，
+    LOD / 实例化的物体共享同一份数据时，只需对每组的第一个物体计算并应用一次
+    返回: [(代表物体, 全部成员列表)]
+    """
+    groups = {}
+    for obj in objects:
+        key = (obj.data.as_pointer(), tuple(obj.vertex_groups.keys()))
+        groups.setdefault(key, []).append(obj)
+    return [(members[0], members) for members in groups.values()]
+
 def merge_vgroups_to_main(obj, main_name, aux_names):
     """
-    将多个辅助顶点组的权重合并到主顶点组
+    将多个辅助顶点组的权重合并到主顶点组 (主组不存在时新建，辅助组合并后删除)
     obj: Mesh 对象
     main_name: 主顶点组名 (String)
     aux_names: 辅助顶点组名列表 (List of Strings)
+    编译为只含一次合并的重映射表，经 apply_remap_plan 一次读取、计算、写回
+    返回: 网格是否被修改
+    """
+    builder = remap_plan.RemapPlanBuilder(obj.vertex_groups.keys())
+    builder.merge(main_name, aux_names)
+    return apply_remap_plan(obj, builder.build())
+
+def deform_slot_mask(obj, plan):
+    """
+    受骨架形变时，只有对应形变骨骼 (use_deform) 的顶点组参与影响数限制与归一化
+    一个 slot 的最终名、原始名或任一并入组的名字是形变骨骼即视为形变组
+    (转换时组名已改为 Y 名，而骨架仍是 X 名)
+    返回与 plan.slots 等长的布尔掩码；没有骨架时返回 None
+    (此时无法区分骨骼组与遮罩/布料固定等功能组，调用方应跳过限制)
+    """
+    arm = obj.find_armature()
+    if arm is None:
+        return None
+    bones = arm.data.bones
+    deform = {b.name for b in bones if b.use_deform}
+    names = plan.group_names
+    mask = []
+    for name, base, merged in plan.slots:
+        candidates = [name]
+        if base is not None:
+            candidates.append(names[base])
+        candidates.extend(names[m] for m in merged)
+        mask.append(any(n in deform for n in candidates))
+    return np.array(mask, dtype=bool)
+
+# --- 计算后端 ---
+
+# 未启用插件 (例如命令行批处理直接导入) 时的默认分块大小；0 = 不分块
+# 分块流式处理在主线程上逐块进行，不经过线程池，只在内存受限时才值得开启
+DEFAULT_CHUNK_SIZE = 0
+
+def _addon_preferences():
+    addon = bpy.context.preferences.addons.get(__package__.rpartition('.')[0])
+    return addon.preferences if addon else None
+
+def stream_chunk_size():
+    """插件设置中的权重分块大小 (顶点数)；0 表示不分块"""
+    prefs = _addon_preferences()
+    return DEFAULT_CHUNK_SIZE if prefs is None else prefs.weight_chunk_size
+
+def write_precision():
+    """插件设置中的权重写回精度 (见 bpy_adapters.write_vgroup_weights)；0 表示精确写回"""
+    prefs = _addon_preferences()
+    return 0 if prefs is None else prefs.weight_write_precision
+
+def use_process_backend(n_rows):
+    """插件设置选择了多进程后端，且网格顶点数达到阈值"""
+    prefs = _addon_preferences()
+    if prefs is None or prefs.weight_backend != 'PROCESS':
+        return False
+    return n_rows >= prefs.process_min_vertices
+
+def shutdown_workers():
+    """关闭多进程后端的进程池 (插件注销时调用)"""
+    weight_kernels.shutdown()
+
+class RemapJob:
+    """
+    一个网格的重映射任务，分三段执行：
+    prepare (主线程读取) -> compute (纯数组运算，可在线程池/进程池中运行) -> commit (主线程写回)
+    chunk_size > 0 时不做整体读取，写回阶段按顶点分块流式处理 (见 _commit_streamed)
+    """
+    def __init__(self, obj, plan, weight_limit=None):
+        self.obj = obj
+        self.plan = plan
+        self.weight_limit = weight_limit
+        self.coo = None
+        self.n_rows = 0
+        self.chunk_size = 0
+        self.precision = 0
+        self.deform_mask = None
+        self.changes = {}
+
+    def compute(self):
+        """只使用 NumPy，不访问 bpy"""
+        if self.coo is not None:
+            matrix = WeightMatrix.from_coo(*self.coo, self.n_rows, self.plan.group_names)
+            self.changes = matrix.remap_changes(self.plan, self.weight_limit, self.deform_mask)
+            self.coo = None
+        return self
+
+    def compute_in_processes(self):
+        """超大网格：按顶点区间分给工作进程 (见 weight_kernels)；进程池不可用时退回本进程计算"""
+        if self.coo is None:
+            return self
+        try:
+            self.changes = weight_kernels.remap_changes(*self.coo, self.n_rows, self.plan,
+                                                        self.weight_limit, self.deform_mask)
+        except (OSError, ImportError, BrokenProcessPool) as e:
+            print(f"[Weights] 多进程计算不可用，改为单进程: {e}")
+            shutdown_workers()
+            return self.compute()
+        self.coo = None
+        return self
+
+def prepare_remap(obj, plan, weight_limit=None, chunk_size=0):
+    """
+    主线程：校验重映射表并一次性读取权重 (只有需要合并/限制时才读取)
+    chunk_size: 顶点数超过该值的网格 (未使用进程池时) 改为写回阶段分块流式处理，0 表示不分块
     """
-    if main_name not in obj.vertex_groups:
-        obj.vertex_groups.new(name=main_name)
+    vgs = obj.vertex_groups
+    if vgs.keys() != list(plan.group_names):
+        raise ValueError(f"Remap plan does not match vertex groups of {obj.name}")
+    job = RemapJob(obj, plan, weight_limit)
+    job.precision = write_precision()
+    if weight_limit:
+        job.deform_mask = deform_slot_mask(obj, plan)
+        if job.deform_mask is None:
+            job.weight_limit = None  # 没有骨架：不限制
+    if job.weight_limit or any(merged for _, _, merged in plan.slots):
+        job.n_rows = len(obj.data.vertices)
+        if chunk_size and job.n_rows > chunk_size and not use_process_backend(job.n_rows):
+            job.chunk_size = chunk_size
+        else:
+            job.coo = read_vgroup_weights(obj)
+    return job
+
+def _write_changes(vg, rows, values, removed, precision=0):
+    if len(removed):
+        vg.remove(removed.tolist())
+    write_vgroup_weights(vg, rows, values, precision)
+
+def _rename_groups(pairs):
+    """批量重命名 (先改为临时名，避免与尚未改名的组冲突)"""
+    pairs = [(vg, name) for vg, name in pairs if vg.name != name]
+    for i, (vg, _) in enumerate(pairs):
+        vg.name = f"__remap_tmp_{i}"
+    for vg, name in pairs:
+        vg.name = name
+
+def _rewritten_slots(job):
+    """
+    流式处理中需要整列重写的 slot：新建组、有并入组的组，以及参与影响数限制的组
+    其余 slot 的权重与原始组相同，只需重命名
+    """
+    rewritten = []
+    for k, (_, base_i, merged) in enumerate(job.plan.slots):
+        limited = job.weight_limit and (job.deform_mask is None or job.deform_mask[k])
+        if base_i is None or merged or limited:
+            rewritten.append(k)
+    return rewritten
+
+def _commit_streamed(job):
+    """
+    分块流式应用：读取一块 -> 计算 -> 写回一块，峰值内存只与块大小有关
+    需要重写的 slot 各自写入一个新建的占位组 (追加在末尾，不改变原始组的索引，后续块照常按原始索引读取)；
+    全部块写完后才删除被合并/替换的原始组并把占位组改为最终名，
+    因此被重写的组会移到组列表末尾 (不分块时保持原位)
+    任一块失败时只需删除占位组，原始组从未被修改，不保留任何回滚数据
+    """
+    plan = job.plan
+    vgs = job.obj.vertex_groups
+    orig_vgs = list(vgs)
+    rewritten = _rewritten_slots(job)
+    placeholders = {}
+    try:
+        for k in rewritten:
+            vg = placeholders[k] = vgs.new(name=f"__remap_new_{k}")
+            base_i = plan.slots[k][1]
+            if base_i is not None:
+                vg.lock_weight = orig_vgs[base_i].lock_weight
+        chunks = iter_vgroup_chunks(job.obj, job.chunk_size)
+        for _, columns in stream_remap(chunks, plan, job.weight_limit, job.deform_mask, rewritten):
+            for k, (rows, values) in columns.items():
+                write_vgroup_weights(placeholders[k], rows, values, job.precision)
+    except BaseException:
+        for vg in placeholders.values():
+            vgs.remove(vg)
+        raise
+
+    replaced = {plan.slots[k][1] for k in rewritten} - {None}
+    for i in sorted(set(plan.removed) | replaced):
+        vgs.remove(orig_vgs[i])
+    _rename_groups((placeholders[k] if k in placeholders else orig_vgs[base_i], name)
+                   for k, (name, base_i, _) in enumerate(plan.slots))
+    return plan.changed or bool(rewritten)
+
+def commit_remap(job):
+    """
+    主线程：统一执行删除 / 重命名 / 新建 / 写回
+    返回: 网格是否被修改
+    """
+    if job.chunk_size:
+        return _commit_streamed(job)
     
-    target_vg = obj.vertex_groups[main_name]
+    plan, changes = job.plan, job.changes
+    if not plan.changed and not changes:
+        return False
     
-    for aux_name in aux_names:
-        if aux_name in obj.vertex_groups:
-            # 使用 Blender 内置的 Mix 修饰符逻辑或简单通过顶点遍历
-            source_vg = obj.vertex_groups[aux_name]
-            
-            for v in obj.data.vertices:
-                try:
-                    # 获取辅助组的权重
-                    weight = source_vg.weight(v.index)
-                    if weight > 0:
-                        # 叠加到主组
-                        target_vg.add([v.index], weight, 'ADD')
-                except RuntimeError:
-                    pass # 该顶点不在辅助组中
-            
-            # 合并完后删除辅助组，防止重名冲突
-            obj.vertex_groups.remove(source_vg)
\ No newline at end of file
+    vgs = job.obj.vertex_groups
+    orig_vgs = list(vgs)
+    
+    # 1. 删除被合并/覆盖的原始组
+    for i in plan.removed:
+        vgs.remove(orig_vgs[i])
+    
+    # 2. 重命名
+    _rename_groups((orig_vgs[base_i], name) for name, base_i, _ in plan.slots if base_i is not None)
+    
+    # 3. 新建组并写回权重差异
+    for k, (name, base_i, _) in enumerate(plan.slots):
+        vg = orig_vgs[base_i] if base_i is not None else vgs.new(name=name)
+        if k in changes:
+            _write_changes(vg, *changes[k], job.precision)
+    return True
+
+def apply_remap_plan(obj, plan, weight_limit=None):
+    """
+    一次遍历应用整张重映射表 (见 remap_plan.RemapPlan)
+    所有合并在 CSR 矩阵上计算，随后统一执行删除 / 重命名 / 新建 / 写回
+    weight_limit: {"max_influences": k, "normalize": bool} (见 bone_mapper.parse_weight_limit)
+        在同一次计算中对合并结果做影响数限制与归一化
+    返回: 网格是否被修改
+    """
+    return commit_remap(prepare_remap(obj, plan, weight_limit, stream_chunk_size()).compute())
+
+def apply_remap_plans(items, weight_limit=None, max_workers=None):
+    """
+    多网格版本：items 为 [(obj, plan)]
+    读取与写回在主线程逐个进行，中间的数组运算交给线程池 (NumPy 大部分运算会释放 GIL)；
+    插件设置启用多进程后端时，顶点数达到阈值的网格改用进程池 + 共享内存
+    设置了分块大小时，顶点数超过该值的网格在写回阶段逐块流式处理 (峰值内存受块大小限制)
+    任一网格计算失败时在写回前抛出；流式处理的网格失败时删除其占位组，不会留下写了一半的数据
+    返回: 实际被修改的网格物体列表
+    """
+    chunk_size = stream_chunk_size()
+    jobs = [prepare_remap(obj, plan, weight_limit, chunk_size) for obj, plan in items]
+    pending = [job for job in jobs if job.coo is not None]
+
+    # 超大网格逐个交给进程池 (每个网格已占满全部核心)，其余网格在线程池中并行
+    huge = [job for job in pending if use_process_backend(job.n_rows)]
+    for job in huge:
+        job.compute_in_processes()
+    pending = [job for job in pending if job.coo is not None]
+
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(RemapJob.compute, pending))
+    else:
+        for job in pending:
+            job.compute()
+
+    return [job.obj for job in jobs if commit_remap(job)]
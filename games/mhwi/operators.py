@@ -1,7 +1,7 @@
 import bpy
 from ...core import bone_utils
 from . import data_maps
-from ...core import bone_utils
+from ...core import math_utils
 from ...core import weight_utils
 from ...core.bone_mapper import BoneMapManager, STANDARD_BONE_NAMES
 
@@ -29,23 +29,19 @@ class MHWI_OT_AlignNonPhysics(bpy.types.Operator):
             bpy.ops.object.mode_set(mode='OBJECT')
         context.view_layer.update()
         
-        # 预读取源骨骼
-        source_heads = {}
-        s_matrix = source_armature.matrix_world
-        for b in source_armature.data.bones:
-            source_heads[b.name] = s_matrix @ b.head_local.copy()
+        # 预读取源骨骼 (批量转换到目标骨架本地坐标)
+        source_positions = math_utils.bone_positions_in_space(source_armature, target_armature)
 
         context.view_layer.objects.active = target_armature
         bpy.ops.object.mode_set(mode='EDIT')
         target_edit_bones = target_armature.data.edit_bones
-        t_matrix_inv = target_armature.matrix_world.inverted()
         
-        aligned_count = 0
+        targets = {}
         skip_count = 0
         
         for t_bone in target_edit_bones:
             name = t_bone.name
-            # 过滤物理骨骼
+            # 过滤物理骨骼 (不主动对齐，但仍跟随父级移动)
             if name.startswith("MhBone_") or name.startswith("bonefunction_"):
                 try:
                     num = int(name.split("_")[-1])
@@ -54,18 +50,11 @@ class MHWI_OT_AlignNonPhysics(bpy.types.Operator):
                         continue
                 except: pass
 
-            if name in source_heads:
-                s_head_world = source_heads[name]
-                old_head = t_bone.head.copy()
-                new_head = t_matrix_inv @ s_head_world
-                
-                orig_vec = t_bone.tail - t_bone.head
-                t_bone.head = new_head
-                t_bone.tail = new_head + orig_vec
-                
-                # 递归移动
-                bone_utils.propagate_movement(t_bone, new_head - old_head)
-                aligned_count += 1
+            if name in source_positions:
+                targets[name] = (source_positions[name][0], None)
+        
+        # 层级对齐 (一次遍历，子级继承父级位移)
+        aligned_count = bone_utils.align_bones_hierarchical(target_edit_bones, targets)
             
         bpy.ops.object.mode_set(mode='OBJECT')
         self.report({'INFO'}, f"对齐: {aligned_count}, 跳过物理骨: {skip_count}")
@@ -129,3 +129,30 @@ FAKEBONE_FINGER_PATTERNS = [
     ("L_IndexF", 3), ("L_MiddleF", 3), ("L_RingF", 3), ("L_PinkyF", 3), ("L_Thumb", 3),
     ("R_IndexF", 3), ("R_MiddleF", 3), ("R_RingF", 3), ("R_PinkyF", 3), ("R_Thumb", 3),
 ]
+
+# FakeBone 统一流程的规格表 (按顺序执行，全部在目标骨架的一次编辑模式内完成)
+#   constrained: 从源骨架复制旋转/位置/缩放的骨骼
+#   parents:     fake -> [pname] 的 End 骨骼表；None 表示由标尺骨架的层级关系生成
+#   exclude:     parents 为 None 时，不参与生成层级表的骨骼
+#   suffix_index: 多个 pname 时，后缀取 pname 的第几个字符 (身体: L/R，手指: R_Index -> I)
+#   merge_map / patterns: End 骨骼创建后的重新挂载规则 (与合并操作相同)
+FAKEBONE_SPECS = [
+    {
+        "name": "body",
+        "constrained": FAKEBONE_BODY_BONES,
+        "parents": {fake: FAKEBONE_BODY_PARENTS[fake] for fake in FAKEBONE_BODY_FAKES},
+        "exclude": [],
+        "suffix_index": 0,
+        "merge_map": {},
+        "patterns": [],
+    },
+    {
+        "name": "fingers",
+        "constrained": FAKEBONE_FINGER_BONES,
+        "parents": None,
+        "exclude": ["R_Hand", "L_Hand"],
+        "suffix_index": 2,
+        "merge_map": FAKEBONE_FINGER_MERGE_MAP,
+        "patterns": FAKEBONE_FINGER_PATTERNS,
+    },
+]
@@ -0,0 +1,238 @@
+import bpy
+import mathutils
+from . import data_maps
+
+# ==========================================
+# RE4 假骨 (FakeBone / End 骨骼) 生成器
+# ==========================================
+# 直接由源骨架与标尺骨架的矩阵计算 End 骨骼的静止矩阵，
+# 结果与旧流程 (复制骨架 -> 旋转约束 -> 应用 -> 缩放/位置约束 -> 应用 -> 删骨) 相同：
+#   第一轮 F1: 标尺骨架做 FK，约束骨骼的旋转替换为源骨骼的世界旋转
+#   第二轮 F2: 以 F1 为静止姿态再做 FK，约束骨骼的位置/缩放替换为源骨骼的世界位置/缩放
+#   End 骨骼 = F1(fake) 跟随其父级 (pname) 从 F1 变换到 F2
+# 不创建临时物体、不求值约束，只需一次编辑模式。
+
+def _hierarchy_order(armature_obj):
+    """父级先于子级的 [(骨骼名, 父级名或 None)]"""
+    order = []
+    stack = [b for b in reversed(armature_obj.data.bones) if b.parent is None]
+    while stack:
+        bone = stack.pop()
+        order.append((bone.name, bone.parent.name if bone.parent else None))
+        stack.extend(reversed(bone.children))
+    return order
+
+def _world_pose_matrices(armature_obj):
+    mw = armature_obj.matrix_world
+    return {pb.name: mw @ pb.matrix for pb in armature_obj.pose.bones}
+
+def _forward_kinematics(order, rest, override):
+    """
+    rest: 静止世界矩阵；override(name, matrix) 返回约束后的矩阵 (或原矩阵)
+    子级保持相对父级的局部变换
+    """
+    result = {}
+    for name, parent in order:
+        if parent is None:
+            m = rest[name]
+        else:
+            m = result[parent] @ (rest[parent].inverted() @ rest[name])
+        result[name] = override(name, m)
+    return result
+
+def get_spec(name):
+    for spec in data_maps.FAKEBONE_SPECS:
+        if spec["name"] == name:
+            return spec
+    raise KeyError(name)
+
+def collect_spec_pairs(spec, ruler_arm):
+    """
+    按规格表生成 End 骨骼列表：[(fake, pname, 新骨骼名)]
+    旧流程先删除了骨架上已有的 end 骨骼，这里同样忽略它们
+    """
+    bones = ruler_arm.data.bones
+    parents = spec["parents"]
+    if parents is None:
+        # 父级关系由标尺骨架的层级动态生成：父骨骼 -> [子骨骼]
+        parents = {}
+        for bone_name in spec["constrained"]:
+            if bone_name in spec["exclude"]: continue
+            bone = bones.get(bone_name)
+            if not bone or not bone.parent: continue
+            parents.setdefault(bone.parent.name, []).append(bone_name)
+
+    idx = spec["suffix_index"]
+    pairs = []
+    for fake, pnames in parents.items():
+        if "end" in fake or fake not in bones: continue
+        for pname in pnames:
+            if "end" in pname or pname not in bones: continue
+            suffix = "_end"
+            if pname[0] in ['L', 'R'] and len(pnames) > 1:
+                # 身体取 L/R；手指取 RE4 命名中的第 3 个字符：R_Index... -> I
+                suffix = f"_end{pname[idx]}"
+            pairs.append((fake, pname, fake + suffix))
+    return pairs
+
+class _PoseSnapshot:
+    """标尺/源骨架的层级顺序与世界矩阵，多个规格共用一次读取"""
+    def __init__(self, source_arm, ruler_arm):
+        self.order = _hierarchy_order(ruler_arm)
+        self.ruler_world = _world_pose_matrices(ruler_arm)
+        self.source_world = _world_pose_matrices(source_arm)
+
+def compute_end_bones(source_arm, ruler_arm, constrained, pairs, snapshot=None):
+    """
+    constrained: 受约束的骨骼名列表 (FAKEBONE_*_BONES)
+    pairs: [(fake, pname, 新骨骼名)]
+    返回: [(新骨骼名, 世界矩阵, 世界坐标 tail, 连接时的 head 或 None)]
+    """
+    if snapshot is None:
+        snapshot = _PoseSnapshot(source_arm, ruler_arm)
+    order = snapshot.order
+    ruler_world = snapshot.ruler_world
+    source_world = snapshot.source_world
+    active = {n for n in constrained if n in source_world and n in ruler_world}
+
+    # 第一轮：复制旋转 (保留自身位置与缩放)
+    def copy_rotation(name, m):
+        if name not in active:
+            return m
+        loc, _, scale = m.decompose()
+        return mathutils.Matrix.LocRotScale(loc, source_world[name].to_quaternion(), scale)
+
+    # 第二轮：复制缩放 + 位置 (保留旋转)
+    def copy_scale_location(name, m):
+        if name not in active:
+            return m
+        _, rot, _ = m.decompose()
+        src_loc, _, src_scale = source_world[name].decompose()
+        return mathutils.Matrix.LocRotScale(src_loc, rot, src_scale)
+
+    f1 = _forward_kinematics(order, ruler_world, copy_rotation)
+    f2 = _forward_kinematics(order, f1, copy_scale_location)
+
+    bones = ruler_arm.data.bones
+    results = []
+    for fake, pname, new_name in pairs:
+        # End 骨骼挂在 pname 下，随 pname 从 F1 变换到 F2
+        follow = f2[pname] @ f1[pname].inverted()
+        m = follow @ f1[fake]
+        tail = m @ mathutils.Vector((0, bones[fake].length, 0))
+
+        connect_head = None
+        if bones[fake].use_connect:
+            # 旧流程中 use_connect 会把 head 吸附到 pname 的 tail
+            connect_head = follow @ (f1[pname] @ mathutils.Vector((0, bones[pname].length, 0)))
+        results.append((new_name, m, tail, connect_head))
+    return results
+
+def build_end_armature(context, ruler_arm, end_bones, name):
+    """
+    新建一个只含 End 骨骼的骨架物体 (与标尺骨架同一世界矩阵)，一次编辑模式写入全部骨骼
+    """
+    arm_data = bpy.data.armatures.new(name)
+    end_obj = bpy.data.objects.new(name, arm_data)
+    collections = ruler_arm.users_collection
+    (collections[0] if collections else context.collection).objects.link(end_obj)
+    end_obj.matrix_world = ruler_arm.matrix_world.copy()
+
+    if context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.select_all(action='DESELECT')
+    end_obj.select_set(True)
+    context.view_layer.objects.active = end_obj
+
+    bpy.ops.object.mode_set(mode='EDIT')
+    write_end_bones(end_obj, end_bones)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return end_obj
+
+def write_end_bones(arm_obj, end_bones):
+    """在 arm_obj 的编辑模式中创建 End 骨骼 (世界矩阵 -> 骨架本地)；同名骨骼已存在时直接覆盖其变换"""
+    edit_bones = arm_obj.data.edit_bones
+    inv = arm_obj.matrix_world.inverted()
+    created = []
+    for new_name, m, tail, connect_head in end_bones:
+        local = inv @ m
+        head_local = local.to_translation()
+        length = (inv @ tail - head_local).length
+
+        eb = edit_bones.get(new_name) or edit_bones.new(new_name)
+        # 先给出长度，再用归一化的矩阵确定朝向与 roll
+        eb.head = (0, 0, 0)
+        eb.tail = (0, length if length > 1e-6 else 0.01, 0)
+        eb.matrix = mathutils.Matrix.Translation(head_local) @ local.to_3x3().normalized().to_4x4()
+        if connect_head is not None:
+            eb.head = inv @ connect_head
+        eb.use_connect = False
+        created.append(eb)
+    return created
+
+def compute_spec_end_bones(source_arm, ruler_arm, specs):
+    """按规格表依次计算所有 End 骨骼；返回 [(spec, end_bones, pairs)]"""
+    snapshot = _PoseSnapshot(source_arm, ruler_arm)
+    results = []
+    for spec in specs:
+        pairs = collect_spec_pairs(spec, ruler_arm)
+        end_bones = compute_end_bones(source_arm, ruler_arm, spec["constrained"], pairs, snapshot)
+        results.append((spec, end_bones, pairs))
+    return results
+
+def parent_end_bones(edit_bones, spec, pairs):
+    """
+    与合并操作相同的挂载规则：
+    1. End 骨骼挂到其 fake 骨骼下
+    2. merge_map: 指定骨骼挂到 End 骨骼下
+    3. patterns: 后续指节挂到上一节的 End 骨骼下
+    """
+    for fake, _, new_name in pairs:
+        bone = edit_bones.get(new_name)
+        base = edit_bones.get(fake)
+        if bone and base:
+            bone.parent = base
+            bone.use_connect = False
+
+    for child_name, parent_name in spec["merge_map"].items():
+        child = edit_bones.get(child_name)
+        parent = edit_bones.get(parent_name)
+        if child and parent:
+            child.parent = parent
+            child.use_connect = False
+
+    for finger_base, num_segments in spec["patterns"]:
+        for i in range(2, num_segments + 1):
+            child = edit_bones.get(f"{finger_base}{i}")
+            parent = edit_bones.get(f"{finger_base}{i-1}_end")
+            if child and parent:
+                child.parent = parent
+                child.use_connect = False
+
+def build_fakebones(context, target_arm, ruler_arm, specs=None):
+    """
+    统一流程：在目标骨架上一次编辑模式内创建并挂载全部规格的 End 骨骼
+    (等价于 创建身体/手指 End 骨骼 + 合并身体/手指骨骼，无需 join)
+    target_arm 同时作为源骨架 (提供旋转/位置/缩放)
+    返回创建的 End 骨骼数量
+    """
+    if specs is None:
+        specs = data_maps.FAKEBONE_SPECS
+    results = compute_spec_end_bones(target_arm, ruler_arm, specs)
+
+    if context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    context.view_layer.objects.active = target_arm
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = target_arm.data.edit_bones
+    count = 0
+    # 先全部创建，再统一挂载 (merge_map 可能引用其他规格的 End 骨骼)
+    for _, end_bones, _ in results:
+        write_end_bones(target_arm, end_bones)
+        count += len(end_bones)
+    for spec, _, pairs in results:
+        parent_end_bones(edit_bones, spec, pairs)
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return count
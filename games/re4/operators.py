@@ -1,11 +1,22 @@
 import bpy
-from ...core import bone_utils
-from . import data_maps
+from ...core import bone_utils, math_utils
+from . import data_maps, fakebone
 
 # ==========================================
 # RE4 假骨工具 (FakeBone Tools)
 # ==========================================
 
+def _get_source_and_ruler(context):
+    """活动骨架为源 (Source)，另一个选中的骨架为标尺 (Ruler)"""
+    selected = [o for o in context.selected_objects if o.type == 'ARMATURE']
+    if len(selected) != 2:
+        return None, None, len(selected)
+    source = context.active_object
+    others = [o for o in selected if o != source]
+    if source not in selected or len(others) != 1:
+        return None, None, len(selected)
+    return source, others[0], 2
+
 class RE4_OT_FakeBody_Process(bpy.types.Operator):
     """创建身体 End 骨骼"""
     bl_idname = "re4.fake_body_process"
@@ -13,93 +24,21 @@ class RE4_OT_FakeBody_Process(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
-        selected = [o for o in context.selected_objects if o.type == 'ARMATURE']
-        if len(selected) != 2:
+        source, ruler, _ = _get_source_and_ruler(context)
+        if source is None:
             self.report({'ERROR'}, "请选择两个骨架 (源 -> 目标)")
             return {'CANCELLED'}
         
-        SourceModel_Original = context.active_object
-        RulerModel_Original = [o for o in selected if o != SourceModel_Original][0]
-        
-        bpy.ops.object.select_all(action='DESELECT')
-        SourceModel_Original.select_set(True)
-        context.view_layer.objects.active = SourceModel_Original
-        bpy.ops.object.duplicate()
-        SourceModel = context.active_object
-        
-        bpy.ops.object.select_all(action='DESELECT')
-        RulerModel_Original.select_set(True)
-        context.view_layer.objects.active = RulerModel_Original
-        bpy.ops.object.duplicate()
-        RulerModel = context.active_object
-
-        BoneName = data_maps.FAKEBONE_BODY_BONES
-        armature = RulerModel
-        context.view_layer.objects.active = armature
-        bpy.ops.object.mode_set(mode='POSE')
-
-        for bone_name in BoneName:
-            if bone_name in armature.pose.bones:
-                bone = armature.pose.bones[bone_name]
-                crc = bone.constraints.new('COPY_ROTATION')
-                crc.target = SourceModel
-                crc.subtarget = bone_name
-        
-        bpy.ops.pose.select_all(action='SELECT')
-        bpy.ops.pose.visual_transform_apply()
-        for b in armature.pose.bones:
-            for c in b.constraints: b.constraints.remove(c)
-            
-        bpy.ops.pose.armature_apply()
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        for b in [b for b in armature.data.edit_bones if "end" in b.name]:
-            armature.data.edit_bones.remove(b)
-            
-        FakeName = data_maps.FAKEBONE_BODY_FAKES
-        ParentName = data_maps.FAKEBONE_BODY_PARENTS
-        
-        for fake in FakeName:
-            if fake not in armature.data.edit_bones: continue
-            bone = armature.data.edit_bones[fake]
-            for pname in ParentName[fake]:
-                if pname not in armature.data.edit_bones: continue
-                suffix = "_end"
-                if (pname[0] in ['L', 'R']) and len(ParentName[fake]) > 1:
-                    suffix = f"_end{pname[0]}"
-                new_bone = armature.data.edit_bones.new(bone.name + suffix)
-                new_bone.head = bone.head
-                new_bone.tail = bone.tail
-                new_bone.roll = bone.roll
-                new_bone.parent = armature.data.edit_bones[pname]
-                new_bone.use_connect = bone.use_connect
-
-        bpy.ops.object.mode_set(mode='POSE')
-        for bone_name in BoneName:
-            if bone_name in armature.pose.bones:
-                bone = armature.pose.bones[bone_name]
-                csc = bone.constraints.new('COPY_SCALE')
-                csc.target = SourceModel
-                csc.subtarget = bone_name
-                clc = bone.constraints.new('COPY_LOCATION')
-                clc.target = SourceModel
-                clc.subtarget = bone_name
-                
-        bpy.ops.pose.select_all(action='SELECT')
-        bpy.ops.pose.visual_transform_apply()
-        for b in armature.pose.bones:
-            for c in b.constraints: b.constraints.remove(c)
-        bpy.ops.pose.armature_apply()
+        if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT')
+        context.view_layer.update()
         
-        bpy.ops.object.mode_set(mode='EDIT')
-        for bone in list(armature.data.edit_bones):
-            if "end" not in bone.name:
-                armature.data.edit_bones.remove(bone)
-                
-        bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.data.objects.remove(SourceModel)
+        # 直接由矩阵计算 End 骨骼，不再复制骨架/添加约束/应用姿态
+        spec = fakebone.get_spec("body")
+        pairs = fakebone.collect_spec_pairs(spec, ruler)
+        end_bones = fakebone.compute_end_bones(source, ruler, spec["constrained"], pairs)
+        fakebone.build_end_armature(context, ruler, end_bones, ruler.name + "_end_bones")
         
-        self.report({'INFO'}, "身体 End 骨骼创建完成")
+        self.report({'INFO'}, f"身体 End 骨骼创建完成 ({len(end_bones)} 根)")
         return {'FINISHED'}
 
 class RE4_OT_FakeFingers_Process(bpy.types.Operator):
@@ -109,130 +48,41 @@ class RE4_OT_FakeFingers_Process(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
-        selected_armatures = [obj for obj in bpy.context.selected_objects if obj.type == 'ARMATURE']
-        
-        if len(selected_armatures) != 2:
-            self.report({'ERROR'}, f"请选择两个骨架对象（当前选中了 {len(selected_armatures)} 个）")
+        source, ruler, count = _get_source_and_ruler(context)
+        if source is None:
+            self.report({'ERROR'}, f"请选择两个骨架对象（当前选中了 {count} 个）")
             return {'CANCELLED'}
         
-        SourceModel_Original = bpy.context.active_object
-        RulerModel_Original = [obj for obj in selected_armatures if obj != SourceModel_Original][0]
-        
-        # 复制骨架
-        bpy.ops.object.select_all(action='DESELECT')
-        SourceModel_Original.select_set(True)
-        bpy.context.view_layer.objects.active = SourceModel_Original
-        bpy.ops.object.duplicate()
-        SourceModel = bpy.context.active_object
-        SourceModel.name = SourceModel_Original.name + "_temp_source"
-        
-        bpy.ops.object.select_all(action='DESELECT')
-        RulerModel_Original.select_set(True)
-        bpy.context.view_layer.objects.active = RulerModel_Original
-        bpy.ops.object.duplicate()
-        RulerModel = bpy.context.active_object
-        RulerModel.name = RulerModel_Original.name + "_end_bones"
-        
-        BoneName = data_maps.FAKEBONE_FINGER_BONES
-        ParentName = {}
-
-        armature = RulerModel
-        bpy.context.view_layer.objects.active = armature
-        bpy.ops.object.mode_set(mode='POSE')
-
-        # 1. 旋转约束
-        for bone_name in BoneName:
-            if bone_name not in armature.pose.bones: continue
-            bone = armature.pose.bones[bone_name]
-            copy_rotation = bone.constraints.new('COPY_ROTATION')
-            copy_rotation.target = SourceModel
-            copy_rotation.subtarget = bone_name
-
-        # 2. 建立父级关系表
-        for bone_name in BoneName:
-            if bone_name == "R_Hand" or bone_name == "L_Hand": continue
-            if bone_name not in armature.pose.bones: continue
-            bone = armature.pose.bones[bone_name]
-            
-            pname = bone.parent.name
-            if pname not in ParentName:
-                ParentName[pname] = [bone_name]
-            else:
-                ParentName[pname].append(bone_name)
-
-        # 应用约束
-        bpy.ops.pose.select_all(action='SELECT')
-        bpy.ops.pose.visual_transform_apply()
-        for b in armature.pose.bones:
-            for c in b.constraints: b.constraints.remove(c)
-        bpy.ops.pose.armature_apply()
+        if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT')
+        context.view_layer.update()
         
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        # 删除旧end
-        for bone in list(armature.data.edit_bones):
-            if "end" in bone.name:
-                armature.data.edit_bones.remove(bone)
-
-        # 3. 创建新 End 骨骼
-        for fake in ParentName:
-            if fake not in armature.data.edit_bones: continue
-            bone = armature.data.edit_bones[fake]
-            
-            for child_name in ParentName[fake]:
-                if child_name not in armature.data.edit_bones: continue
-                
-                if (child_name.startswith('L') or child_name.startswith('R')) and len(ParentName[fake]) > 1:
-                    # 这里的魔法数字 [2] 是根据 RE4 命名规范：R_Index... -> I
-                    suffix = "_end{}".format(child_name[2])
-                    new_bone = armature.data.edit_bones.new(bone.name + suffix)
-                else:
-                    new_bone = armature.data.edit_bones.new(bone.name + "_end")
-                
-                new_bone.head = bone.head
-                new_bone.tail = bone.tail
-                new_bone.roll = bone.roll
-                
-                parent_bone = armature.data.edit_bones[child_name]
-                new_bone.parent = parent_bone
-                new_bone.use_connect = bone.use_connect
+        spec = fakebone.get_spec("fingers")
+        pairs = fakebone.collect_spec_pairs(spec, ruler)
+        end_bones = fakebone.compute_end_bones(source, ruler, spec["constrained"], pairs)
+        # 生成后新骨架为活动物体，便于接着执行合并
+        fakebone.build_end_armature(context, ruler, end_bones, ruler.name + "_end_bones")
         
-        bpy.ops.object.mode_set(mode='POSE')
-
-        # 4. 缩放和位置约束
-        for bone_name in BoneName:
-            if bone_name not in armature.pose.bones: continue
-            bone = armature.pose.bones[bone_name]
-            
-            csc = bone.constraints.new('COPY_SCALE')
-            csc.target = SourceModel
-            csc.subtarget = bone_name
-            clc = bone.constraints.new('COPY_LOCATION')
-            clc.target = SourceModel
-            clc.subtarget = bone_name
+        self.report({'INFO'}, f"手指 End 骨骼创建完成 ({len(end_bones)} 根)")
+        return {'FINISHED'}
 
-        bpy.ops.pose.select_all(action='SELECT')
-        bpy.ops.pose.visual_transform_apply()
-        for b in armature.pose.bones:
-            for c in b.constraints: b.constraints.remove(c)
-        bpy.ops.pose.armature_apply()
-        
-        bpy.ops.object.mode_set(mode='EDIT')
-        
-        # 删除所有非 end 骨骼
-        for bone in list(armature.data.edit_bones):
-            if "end" not in bone.name:
-                armature.data.edit_bones.remove(bone)
+class RE4_OT_FakeBone_Build(bpy.types.Operator):
+    """一键创建并挂载身体与手指 End 骨骼 (直接写入活动骨架，无需合并)"""
+    bl_idname = "re4.fakebone_build"
+    bl_label = "一键生成假骨"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        source, ruler, count = _get_source_and_ruler(context)
+        if source is None:
+            self.report({'ERROR'}, f"请选择两个骨架对象（当前选中了 {count} 个）")
+            return {'CANCELLED'}
         
-        bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.data.objects.remove(SourceModel)
+        if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT')
+        context.view_layer.update()
         
-        # 选中新骨架
-        bpy.ops.object.select_all(action='DESELECT')
-        armature.select_set(True)
-        context.view_layer.objects.active = armature
+        created = fakebone.build_fakebones(context, source, ruler)
         
-        self.report({'INFO'}, "手指 End 骨骼创建完成")
+        self.report({'INFO'}, f"假骨生成完成: {created} 根 End 骨骼")
         return {'FINISHED'}
 
 class RE4_OT_FakeBody_Merge(bpy.types.Operator):
@@ -291,12 +141,12 @@ class RE4_OT_FakeFingers_Merge(bpy.types.Operator):
         bpy.ops.object.mode_set(mode='EDIT')
 
         # 1. 挂载 fakebones 到父级
-        fakebones = [b for b in armature.data.edit_bones if "_end" in b.name]
-        for fakebone in fakebones:
-            base_name = fakebone.name.split("_end")[0]
+        end_bones = [b for b in armature.data.edit_bones if "_end" in b.name]
+        for end_bone in end_bones:
+            base_name = end_bone.name.split("_end")[0]
             if base_name in armature.data.edit_bones:
-                fakebone.parent = armature.data.edit_bones[base_name]
-                fakebone.use_connect = False
+                end_bone.parent = armature.data.edit_bones[base_name]
+                end_bone.use_connect = False
 
         # 2. 挂载手指第一节到 End 骨骼 (Mapping)
         parent_mappings = data_maps.FAKEBONE_FINGER_MERGE_MAP
@@ -340,25 +190,15 @@ class RE4_OT_AlignBones(bpy.types.Operator):
         if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT')
         context.view_layer.update()
         
-        src_data = {}
-        s_mat = source.matrix_world
-        for b in source.data.bones:
-            src_data[b.name] = {'head': s_mat @ b.head_local.copy(), 'tail': s_mat @ b.tail_local.copy()}
+        # 源骨骼 head/tail 批量转换到目标本地坐标
+        src_data = math_utils.bone_positions_in_space(source, target)
             
         context.view_layer.objects.active = target
         bpy.ops.object.mode_set(mode='EDIT')
-        t_mat_inv = target.matrix_world.inverted()
         
-        count = 0
-        for b in target.data.edit_bones:
-            if b.name in src_data:
-                old_head = b.head.copy()
-                new_head = t_mat_inv @ src_data[b.name]['head']
-                b.head = new_head
-                b.tail = t_mat_inv @ src_data[b.name]['tail']
-                
-                bone_utils.propagate_movement(b, new_head - old_head)
-                count += 1
+        edit_bones = target.data.edit_bones
+        targets = {name: src_data[name] for name in edit_bones.keys() if name in src_data}
+        count = bone_utils.align_bones_hierarchical(edit_bones, targets)
         
         bpy.ops.object.mode_set(mode='OBJECT')
         self.report({'INFO'}, f"完全对齐了 {count} 根骨骼")
@@ -380,31 +220,21 @@ class RE4_OT_AlignBones_Pos(bpy.types.Operator):
         if context.mode != 'OBJECT': bpy.ops.object.mode_set(mode='OBJECT')
         context.view_layer.update()
         
-        src_heads = {b.name: source.matrix_world @ b.head_local for b in source.data.bones}
+        src_data = math_utils.bone_positions_in_space(source, target)
         
         context.view_layer.objects.active = target
         bpy.ops.object.mode_set(mode='EDIT')
-        t_mat_inv = target.matrix_world.inverted()
         
-        count = 0
-        for b in target.data.edit_bones:
-            if b.name in src_heads:
-                old_head = b.head.copy()
-                new_head = t_mat_inv @ src_heads[b.name]
-                orig_vec = b.tail - b.head
-                
-                b.head = new_head
-                b.tail = new_head + orig_vec
-                
-                bone_utils.propagate_movement(b, new_head - old_head)
-                count += 1
+        edit_bones = target.data.edit_bones
+        targets = {name: (src_data[name][0], None) for name in edit_bones.keys() if name in src_data}
+        count = bone_utils.align_bones_hierarchical(edit_bones, targets)
                 
         bpy.ops.object.mode_set(mode='OBJECT')
         self.report({'INFO'}, f"位置对齐了 {count} 根骨骼")
         return {'FINISHED'}
 
 classes = [
-    RE4_OT_FakeBody_Process, RE4_OT_FakeFingers_Process,
+    RE4_OT_FakeBody_Process, RE4_OT_FakeFingers_Process, RE4_OT_FakeBone_Build,
     RE4_OT_FakeBody_Merge, RE4_OT_FakeFingers_Merge,
     RE4_OT_AlignBones, RE4_OT_AlignBones_Pos,
 ]
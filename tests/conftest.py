@@ -0,0 +1,10 @@
+"""
+core 中的纯模块 (model.py / remap_plan.py) 不依赖 bpy，把 core 目录加入 sys.path 后
+可以在普通 CPython 中直接导入测试：python -m pytest tests
+"""
+import os
+import sys
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core")
+if CORE_DIR not in sys.path:
+    sys.path.insert(0, CORE_DIR)
@@ -0,0 +1,114 @@
+import numpy as np
+
+from model import Skeleton
+
+def reference_align(skeleton, targets):
+    """逐骨遍历的参考实现 (原 EditBone 版本的对齐逻辑，连接骨骼不写 head)"""
+    heads = [np.array(h, dtype=np.float32) for h in skeleton.heads]
+    tails = [np.array(t, dtype=np.float32) for t in skeleton.tails]
+    children = skeleton.children()
+    roots = [i for i, p in enumerate(skeleton.parents.tolist()) if p < 0]
+    stack = [(r, np.zeros(3, dtype=np.float32), False) for r in reversed(roots)]
+    moved_mask = np.zeros(len(skeleton), dtype=bool)
+    while stack:
+        i, inherited, moved = stack.pop()
+        old_head, old_tail = skeleton.heads[i], skeleton.tails[i]
+        target = targets.get(skeleton.names[i])
+        if target is not None:
+            new_head, new_tail = target
+            new_head = np.asarray(new_head, dtype=np.float32)
+            offset = new_head - old_head
+            heads[i] = new_head
+            tails[i] = old_tail + offset if new_tail is None else np.asarray(new_tail, dtype=np.float32)
+            inherited, moved = offset, True
+        elif moved:
+            heads[i] = old_head + inherited
+            tails[i] = old_tail + inherited
+        moved_mask[i] = moved
+        for child in reversed(children.get(i, ())):
+            stack.append((child, inherited, moved))
+    return np.array(heads), np.array(tails), moved_mask
+
+def random_skeleton(rng, count, connected=False):
+    parents = [-1] + [int(rng.integers(0, i)) for i in range(1, count)]
+    heads = rng.normal(size=(count, 3)).astype(np.float32)
+    tails = (heads + rng.normal(size=(count, 3))).astype(np.float32)
+    flags = np.zeros(count, dtype=bool)
+    if connected:
+        flags = rng.random(count) < 0.5
+        flags[0] = False
+        for i in np.flatnonzero(flags):
+            heads[i] = tails[parents[i]]
+    names = [f"bone_{i}" for i in range(count)]
+    # 打乱存储顺序，确保不依赖 "父级在前"
+    perm = rng.permutation(count)
+    inv = np.argsort(perm)
+    parents = [int(inv[parents[p]]) if parents[p] >= 0 else -1 for p in perm]
+    return Skeleton([names[p] for p in perm], parents, heads[perm], tails[perm],
+                    connected=flags[perm])
+
+def random_targets(rng, skeleton, count):
+    targets = {}
+    for i in rng.choice(len(skeleton), size=count, replace=False).tolist():
+        head = skeleton.heads[i] + rng.normal(size=3).astype(np.float32)
+        tail = None if rng.random() < 0.5 else skeleton.tails[i] + rng.normal(size=3).astype(np.float32)
+        targets[skeleton.names[i]] = (head, tail)
+    return targets
+
+def test_align_matches_reference_without_connections():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        skeleton = random_skeleton(rng, int(rng.integers(1, 60)))
+        targets = random_targets(rng, skeleton, int(rng.integers(0, min(len(skeleton), 6) + 1)))
+        targets["missing_bone"] = ((0, 0, 0), None)
+
+        aligned, moved = skeleton.align_hierarchical(targets)
+        heads, tails, ref_moved = reference_align(skeleton, targets)
+        assert np.allclose(aligned.heads, heads, atol=1e-5)
+        assert np.allclose(aligned.tails, tails, atol=1e-5)
+        assert np.array_equal(moved, ref_moved)
+        # 输入骨架不被修改
+        assert aligned is not skeleton
+
+def test_untargeted_bones_keep_shape():
+    rng = np.random.default_rng(1)
+    skeleton = random_skeleton(rng, 40)
+    targets = random_targets(rng, skeleton, 3)
+    aligned, moved = skeleton.align_hierarchical(targets)
+    lengths = skeleton.lengths()
+    for i, name in enumerate(skeleton.names):
+        if name not in targets:
+            assert np.isclose(aligned.lengths()[i], lengths[i], atol=1e-5)
+    assert np.array_equal(aligned.heads[~moved], skeleton.heads[~moved])
+
+def test_connected_bones_follow_parent_tail():
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        skeleton = random_skeleton(rng, int(rng.integers(2, 40)), connected=True)
+        targets = random_targets(rng, skeleton, int(rng.integers(1, 4)))
+        aligned, moved = skeleton.align_hierarchical(targets)
+
+        # 未对齐的连接骨骼 head 等于父骨骼 tail；
+        # 被对齐的连接骨骼把父骨骼 tail 拉到自己的 head (同一父级下有多根时最后一根生效)
+        for i in np.flatnonzero(aligned.connected):
+            p = aligned.parents[i]
+            if aligned.names[i] not in targets:
+                assert np.allclose(aligned.heads[i], aligned.tails[p], atol=1e-5)
+            else:
+                pulled = [j for j in np.flatnonzero(aligned.connected & (aligned.parents == p))
+                          if aligned.names[j] in targets]
+                assert np.allclose(aligned.tails[p], aligned.heads[pulled[-1]], atol=1e-5)
+        for name, (head, _) in targets.items():
+            assert np.allclose(aligned.heads[aligned.index[name]], head, atol=1e-5)
+        changed = (np.any(aligned.heads != skeleton.heads, axis=1)
+                   | np.any(aligned.tails != skeleton.tails, axis=1))
+        assert not np.any(changed & ~moved)
+
+def test_connected_target_pulls_parent_tail():
+    skeleton = Skeleton(["root", "child"], [-1, 0],
+                        [(0, 0, 0), (0, 0, 1)], [(0, 0, 1), (0, 0, 2)], connected=[False, True])
+    aligned, moved = skeleton.align_hierarchical({"child": ((1, 0, 1), None)})
+    assert np.allclose(aligned.tails[0], (1, 0, 1))
+    assert np.allclose(aligned.heads[0], (0, 0, 0))
+    assert np.allclose(aligned.tails[1], (1, 0, 2))
+    assert moved.tolist() == [True, True]
@@ -0,0 +1,40 @@
+import numpy as np
+
+import remap_plan
+import weight_kernels
+from model import WeightMatrix
+
+def test_split_rows_covers_all_entries():
+    verts = np.array([0, 0, 1, 3, 3, 3, 4, 7], dtype=np.int32)
+    ranges = weight_kernels.split_rows(verts, 9, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 9
+    for (_, stop, _, hi), (start, _, lo, _) in zip(ranges[:-1], ranges[1:]):
+        assert stop == start and hi == lo
+    assert ranges[-1][3] == len(verts)
+
+def test_process_backend_matches_in_process():
+    rng = np.random.default_rng(0)
+    names = [f"g{i}" for i in range(10)]
+    builder = remap_plan.RemapPlanBuilder(names)
+    builder.merge("g0", ["g3", "g4"])
+    builder.merge("new", ["g7"])
+    builder.rename("g1", "renamed")
+    plan = builder.build()
+    try:
+        for limit in (None, {"max_influences": 3, "normalize": True}):
+            n_rows = 5000
+            dense = rng.random((n_rows, 10)) * (rng.random((n_rows, 10)) < 0.4)
+            rows, cols = np.nonzero(dense)
+            weights = dense[rows, cols].astype(np.float32)
+            columns = rng.random(len(plan.slots)) < 0.8
+
+            expected = WeightMatrix.from_coo(rows, cols, weights, n_rows, names).remap_changes(
+                plan, limit, columns)
+            got = weight_kernels.remap_changes(rows.astype(np.int32), cols.astype(np.int32), weights,
+                                               n_rows, plan, limit, columns, max_workers=2)
+            assert sorted(got) == sorted(expected)
+            for k in expected:
+                for a, b in zip(got[k], expected[k]):
+                    assert np.array_equal(a, b) and a.dtype == b.dtype
+    finally:
+        weight_kernels.shutdown()
@@ -0,0 +1,253 @@
+import tracemalloc
+
+import numpy as np
+
+import remap_plan
+from model import WeightMatrix, stream_remap, quantize_weights, weight_buckets
+
+# --- 逐顶点参考实现 (字典 + 逐个组操作，语义与 vertex_groups 的 ADD / REPLACE / remove 一致) ---
+
+def reference_remap(vertices, plan):
+    """vertices: [{组索引: 权重}] -> [{slot 序号: 权重}]"""
+    result = []
+    for groups in vertices:
+        out = {}
+        for k, (_, base, merged) in enumerate(plan.slots):
+            present = base is not None and base in groups
+            value = np.float32(groups[base]) if present else np.float32(0)
+            for m in merged:
+                w = np.float32(groups.get(m, 0))
+                if w > 0:
+                    value = np.float32(min(np.float32(value + w), np.float32(1.0)))
+                    present = True
+            if present:
+                out[k] = np.float32(min(value, np.float32(1.0)))
+        result.append(out)
+    return result
+
+def reference_base(vertices, plan):
+    """只做删除 / 重命名 / 新建后的状态"""
+    result = []
+    for groups in vertices:
+        result.append({k: np.float32(groups[base]) for k, (_, base, _) in enumerate(plan.slots)
+                       if base is not None and base in groups})
+    return result
+
+def reference_limit(vertices, k, normalize, eligible):
+    result = []
+    for groups in vertices:
+        candidates = sorted((c for c in groups if eligible[c]), key=lambda c: (-groups[c], c))
+        kept = {c: w for c, w in groups.items() if not eligible[c] or c in candidates[:k]}
+        if normalize:
+            total = sum(float(kept[c]) for c in sorted(kept) if eligible[c])
+            if total > 0:
+                kept = {c: np.float32(np.float64(w) * (1.0 / total)) if eligible[c] else w
+                        for c, w in kept.items()}
+        result.append(kept)
+    return result
+
+def reference_diff(before, after):
+    changes = {}
+    for row, (old, new) in enumerate(zip(before, after)):
+        for c, w in sorted(new.items()):
+            if c not in old or old[c] != w:
+                changes.setdefault(c, ([], [], []))[0].append(row)
+                changes[c][1].append(w)
+        for c in sorted(old):
+            if c not in new:
+                changes.setdefault(c, ([], [], []))[2].append(row)
+    return changes
+
+# --- 随机数据 ---
+
+def random_mesh(rng, n_rows, n_cols):
+    vertices = []
+    for _ in range(n_rows):
+        count = int(rng.integers(0, min(n_cols, 6) + 1))
+        cols = rng.choice(n_cols, size=count, replace=False)
+        weights = rng.random(count).astype(np.float32)
+        weights[rng.random(count) < 0.1] = 0.0  # 零权重条目也要保留
+        vertices.append({int(c): np.float32(w) for c, w in zip(cols, weights)})
+    return vertices
+
+def to_matrix(vertices, col_names):
+    rows, cols, data = [], [], []
+    for r, groups in enumerate(vertices):
+        for c, w in groups.items():  # 组顺序任意，与 v.groups 一致
+            rows.append(r)
+            cols.append(c)
+            data.append(w)
+    return WeightMatrix.from_coo(rows, cols, data, len(vertices), col_names)
+
+def to_dicts(matrix):
+    result = [{} for _ in range(matrix.n_rows)]
+    for r, c, w in zip(matrix.row_ids().tolist(), matrix.indices.tolist(), matrix.data):
+        result[r][c] = w
+    return result
+
+def random_plan(rng, names):
+    builder = remap_plan.RemapPlanBuilder(names)
+    for _ in range(int(rng.integers(1, 5))):
+        main = names[int(rng.integers(len(names)))] if rng.random() < 0.8 else f"new_{rng.integers(100)}"
+        aux = [names[int(i)] for i in rng.choice(len(names), size=int(rng.integers(1, min(len(names), 3) + 1)), replace=False)]
+        builder.merge(main, aux)
+    for _ in range(int(rng.integers(0, 3))):
+        builder.rename(names[int(rng.integers(len(names)))], f"renamed_{rng.integers(100)}")
+    return builder.build()
+
+def assert_changes_equal(got, expected):
+    assert sorted(got) == sorted(expected)
+    for k, (rows, values, removed) in expected.items():
+        g_rows, g_values, g_removed = got[k]
+        assert g_rows.tolist() == rows
+        assert np.array_equal(g_values, np.array(values, dtype=np.float32))
+        assert g_removed.tolist() == removed
+
+# --- 测试 ---
+
+def test_from_coo_sums_duplicates_and_sorts_rows():
+    matrix = WeightMatrix.from_coo([1, 0, 1, 1], [2, 1, 0, 2], [0.25, 0.5, 0.1, 0.25], 3, ["a", "b", "c"])
+    assert matrix.indptr.tolist() == [0, 1, 3, 3]
+    assert matrix.indices.tolist() == [1, 0, 2]
+    assert np.allclose(matrix.data, [0.5, 0.1, 0.5])
+    assert matrix.row_counts().tolist() == [1, 2, 0]
+
+def test_remap_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n_cols = int(rng.integers(2, 10))
+        names = [f"g{i}" for i in range(n_cols)]
+        vertices = random_mesh(rng, int(rng.integers(0, 50)), n_cols)
+        plan = random_plan(rng, names)
+        remapped = to_matrix(vertices, names).remap(plan)
+        assert remapped.col_names == [name for name, _, _ in plan.slots]
+        assert to_dicts(remapped) == reference_remap(vertices, plan)
+
+def test_limit_influences_matches_reference():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        n_cols = int(rng.integers(1, 10))
+        names = [f"g{i}" for i in range(n_cols)]
+        vertices = random_mesh(rng, int(rng.integers(0, 50)), n_cols)
+        k = int(rng.integers(1, 5))
+        normalize = bool(rng.random() < 0.5)
+        eligible = rng.random(n_cols) < 0.7
+        limited = to_matrix(vertices, names).limit_influences(k, normalize, eligible)
+        assert to_dicts(limited) == reference_limit(vertices, k, normalize, eligible)
+
+def test_normalize_rows_sums_to_one():
+    rng = np.random.default_rng(2)
+    vertices = random_mesh(rng, 100, 8)
+    normalized = to_matrix(vertices, [f"g{i}" for i in range(8)]).normalize_rows()
+    sums = np.bincount(normalized.row_ids(), weights=normalized.data, minlength=100)
+    nonzero = np.array([sum(v.values()) > 0 for v in vertices])
+    assert np.allclose(sums[nonzero], 1.0, atol=1e-6)
+    assert np.all(sums[~nonzero] == 0)
+
+def test_remap_changes_matches_reference():
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        n_cols = int(rng.integers(2, 10))
+        names = [f"g{i}" for i in range(n_cols)]
+        vertices = random_mesh(rng, int(rng.integers(0, 50)), n_cols)
+        plan = random_plan(rng, names)
+        limit = None
+        eligible = np.ones(len(plan.slots), dtype=bool)
+        if rng.random() < 0.5:
+            limit = {"max_influences": int(rng.integers(1, 5)), "normalize": bool(rng.random() < 0.5)}
+            eligible = rng.random(len(plan.slots)) < 0.7
+
+        got = to_matrix(vertices, names).remap_changes(plan, limit, eligible if limit else None)
+
+        final = reference_remap(vertices, plan)
+        if limit:
+            final = reference_limit(final, limit["max_influences"], limit["normalize"], eligible)
+        assert_changes_equal(got, reference_diff(reference_base(vertices, plan), final))
+
+def test_diff_of_identical_matrices_is_empty():
+    rng = np.random.default_rng(4)
+    matrix = to_matrix(random_mesh(rng, 30, 5), list("abcde"))
+    assert matrix.diff(matrix) == {}
+
+def iter_chunks(vertices, chunk_size):
+    """按顶点区间分块产出 COO 三元组 (与 bpy_adapters.iter_vgroup_chunks 相同格式)"""
+    for start in range(0, len(vertices), chunk_size):
+        stop = min(start + chunk_size, len(vertices))
+        rows, cols, data = [], [], []
+        for r in range(start, stop):
+            for c, w in vertices[r].items():
+                rows.append(r)
+                cols.append(c)
+                data.append(w)
+        yield start, stop, (np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32),
+                            np.array(data, dtype=np.float32))
+
+def test_stream_remap_matches_whole_mesh():
+    rng = np.random.default_rng(5)
+    for _ in range(100):
+        n_cols = int(rng.integers(2, 10))
+        names = [f"g{i}" for i in range(n_cols)]
+        vertices = random_mesh(rng, int(rng.integers(1, 60)), n_cols)
+        plan = random_plan(rng, names)
+        limit = {"max_influences": 2, "normalize": True} if rng.random() < 0.5 else None
+
+        final = to_matrix(vertices, names).remap_final(plan, limit)
+        expected = final.column_entries(range(len(plan.slots)))
+        got = {}
+        for _, columns in stream_remap(iter_chunks(vertices, int(rng.integers(1, 20))), plan, limit):
+            for k, (rows, values) in columns.items():
+                got.setdefault(k, ([], []))
+                got[k][0].extend(rows.tolist())
+                got[k][1].extend(values.tolist())
+        assert sorted(got) == sorted(expected)
+        for k, (rows, values) in expected.items():
+            assert got[k][0] == rows.tolist()
+            assert got[k][1] == values.tolist()
+
+def synthetic_chunks(n_rows, n_cols, chunk_size, influences=4):
+    """逐块即时生成权重 (不持有整网格数据)"""
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        rng = np.random.default_rng(start)
+        verts = np.repeat(np.arange(start, stop, dtype=np.int32), influences)
+        groups = rng.integers(0, n_cols, len(verts)).astype(np.int32)
+        yield start, stop, (verts, groups, rng.random(len(verts)).astype(np.float32))
+
+def stream_peak(n_rows, chunk_size):
+    names = [f"g{i}" for i in range(16)]
+    builder = remap_plan.RemapPlanBuilder(names)
+    builder.merge("g0", names[1:8])
+    plan = builder.build()
+    limit = {"max_influences": 4, "normalize": True}
+    tracemalloc.start()
+    try:
+        for _ in stream_remap(synthetic_chunks(n_rows, len(names), chunk_size), plan, limit):
+            pass  # 写回端 (vg.add) 不保留数据
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_stream_remap_peak_memory_bounded_by_chunk_size():
+    chunk = 5000
+    small, large = stream_peak(20000, chunk), stream_peak(200000, chunk)
+    # 网格大 10 倍，峰值内存不随之增长
+    assert large < small * 1.5
+    # 峰值随块大小增长
+    assert stream_peak(200000, chunk * 8) > large * 4
+
+def test_weight_buckets_cover_every_index_once():
+    rng = np.random.default_rng(6)
+    indices = rng.permutation(1000).astype(np.int32)
+    weights = rng.choice(np.array([0.25, 0.5, 1.0], dtype=np.float32), 1000)
+    buckets = list(weight_buckets(indices, weights))
+    assert len(buckets) == 3
+    written = {i: w for chunk, w in buckets for i in chunk}
+    assert written == dict(zip(indices.tolist(), weights.tolist()))
+
+def test_quantize_weights_bounds_bucket_count():
+    weights = np.random.default_rng(7).random(100000).astype(np.float32)
+    assert quantize_weights(weights, 0) is weights
+    quantized = quantize_weights(weights, 255)
+    assert len(np.unique(quantized)) <= 256
+    assert np.max(np.abs(quantized - weights)) <= 0.5 / 255 + 1e-7
+    assert len(list(weight_buckets(np.arange(100000), quantized))) <= 256
@@ -1,9 +1,34 @@
 import bpy
-from ..core import bone_utils, weight_utils, ui_config
+from ..core import bone_utils, weight_utils, ui_config, edit_session
 from ..core.bone_utils import get_import_presets_callback, get_target_presets_callback
-from ..core.bone_mapper import BoneMapManager
+from ..core.bone_mapper import BoneMapManager, load_preset_file
 
 mapper = BoneMapManager()
+
+# 映射预览缓存：只有骨架的骨骼或所选预设变化时才重新计算，面板重绘时直接复用
+_preview_cache = {"key": None, "preset": None, "analysis": {}}
+
+def get_mapping_preview(arm_obj, preset_filename):
+    """返回 {std_key: (主骨名, 辅助骨列表)}；键为 (骨架数据指针, 骨骼名指纹, 预设)"""
+    try:
+        preset = load_preset_file(mapper.get_preset_path(preset_filename, is_import_x=True))
+    except (OSError, ValueError):
+        return {}
+    
+    bone_names = arm_obj.data.bones.keys()
+    key = (arm_obj.data.as_pointer(), hash(tuple(bone_names)), preset_filename)
+    if _preview_cache["key"] == key and _preview_cache["preset"] is preset:
+        return _preview_cache["analysis"]
+    
+    analysis = preset.compiled.resolve(bone_names)
+    _preview_cache.update(key=key, preset=preset, analysis=analysis)
+    return analysis
+
+def _on_import_preset_changed(self, context):
+    # 不是自动识别写入的值 -> 用户手动选择，之后不再自动改动
+    if self.import_preset_enum != self.import_preset_detected:
+        self.import_preset_auto = False
+
 class MHW_PT_SuiteSettings(bpy.types.PropertyGroup):
     # 顶部开关
     show_mhwi: bpy.props.BoolProperty(name="MHWI", default=True)
@@ -17,9 +42,21 @@ class MHW_PT_SuiteSettings(bpy.types.PropertyGroup):
     import_preset_enum: bpy.props.EnumProperty(
         name="来源预设 (X)",
         description="选择导入模型的骨架结构",
-        items=get_import_presets_callback
+        items=get_import_presets_callback,
+        update=_on_import_preset_changed
     )
     
+    # 来源预设自动识别 (见 standard_ops.auto_detect_source_preset)
+    # 手动改选 X 预设后关闭，点击识别按钮重新开启
+    import_preset_auto: bpy.props.BoolProperty(
+        name="自动识别来源预设",
+        description="执行转换前按骨架的骨骼名自动选择来源预设 (X)；手动选择预设后关闭",
+        default=True
+    )
+    import_preset_detected: bpy.props.StringProperty()   # 最近一次自动选中的预设
+    import_preset_detect_info: bpy.props.StringProperty()  # 最近一次识别的说明 (置信度 / 次选)
+    import_preset_ambiguous: bpy.props.BoolProperty()
+    
     target_preset_enum: bpy.props.EnumProperty(
         name="目标游戏 (Y)",
         description="选择要导出的目标游戏",
@@ -27,6 +64,12 @@ class MHW_PT_SuiteSettings(bpy.types.PropertyGroup):
     )
     
     show_mapping_details: bpy.props.BoolProperty(name="显示映射细节", default=False)
+    
+    apply_weight_limit: bpy.props.BoolProperty(
+        name="限制影响数并归一化",
+        description="合并权重时按目标预设 (Y) 的 weight_limit 保留最大的 k 个影响并归一化 (只作用于形变骨骼的顶点组)",
+        default=False
+    )
 
 class MHW_OT_GeneralTools(bpy.types.Operator):
     """通用工具集合"""
@@ -79,9 +122,8 @@ class MHW_OT_GeneralTools(bpy.types.Operator):
             # 调用核心逻辑
             count = bone_utils.add_vertical_tail_bone(edit_bones, selected_bones)
             self.report({'INFO'}, f"添加了 {count} 根尾骨")
-            # 刷新视图
-            bpy.ops.object.mode_set(mode='POSE') 
-            bpy.ops.object.mode_set(mode='EDIT')
+            # 刷新视图 (只请求重绘，不再 POSE/EDIT 来回切换)
+            edit_session.tag_redraw(context)
 
         # =========================================
         # 功能 C: 镜像对齐 X
@@ -206,7 +248,13 @@ class MHW_PT_MainPanel(bpy.types.Panel):
 
         if settings.show_std_converter:
             col = main_box.column(align=True)
-            col.prop(settings, "import_preset_enum", icon='IMPORT')
+            row = col.row(align=True)
+            row.prop(settings, "import_preset_enum", icon='IMPORT')
+            row.operator("modder.detect_source_preset", text="",
+                         icon='VIEWZOOM', depress=settings.import_preset_auto)
+            if settings.import_preset_detect_info:
+                col.label(text=settings.import_preset_detect_info,
+                          icon='ERROR' if settings.import_preset_ambiguous else 'INFO')
             col.prop(settings, "target_preset_enum", icon='EXPORT')
             
             col.separator()
@@ -220,6 +268,8 @@ class MHW_PT_MainPanel(bpy.types.Panel):
             row = col.row(align=True)
             row.scale_y = 1.2
             row.operator("modder.direct_convert", text="重命名顶点组", icon='MOD_VERTEX_WEIGHT')
+            col.prop(settings, "apply_weight_limit")
+            col.operator("modder.convert_pipeline", text="一键流水线 (X -> Y)", icon='PLAY')
             # row.operator("modder.apply_standard_x", text="1. 标准化 (X)", icon='MOD_VERTEX_WEIGHT')
             # row.operator("modder.apply_standard_y", text="2. 游戏化 (Y)", icon='SORTALPHA')
             
@@ -232,8 +282,8 @@ class MHW_PT_MainPanel(bpy.types.Panel):
             
             if settings.show_mapping_details:
                 if arm_obj and arm_obj.type == 'ARMATURE':
-                    # 加载预设进行 UI 反馈
-                    mapper.load_preset(settings.import_preset_enum, is_import_x=True)
+                    # 预览结果带缓存，重绘时不再重复加载预设与匹配
+                    analysis = get_mapping_preview(arm_obj, settings.import_preset_enum)
                     
                     # 绘制三级结构
                     preview_box = col.box()
@@ -246,7 +296,7 @@ class MHW_PT_MainPanel(bpy.types.Panel):
                             sub_col.label(text=sub_name)
                             
                             for std_key in bones:
-                                main_bone, aux_list = mapper.get_matches_for_standard(arm_obj, std_key)
+                                main_bone, aux_list = analysis.get(std_key, (None, []))
                                 m_row = sub_col.row(align=True)
                                 m_row.label(text=f"  {std_key}")
                                 
@@ -285,6 +335,8 @@ class MHW_PT_MainPanel(bpy.types.Panel):
             box_fake = layout.box()
             box_fake.label(text="假骨与对齐 (FakeBone)", icon='BONE_DATA')
             col_fake = box_fake.column(align=True)
+            col_fake.operator("re4.fakebone_build", text="一键生成假骨 (身体+手指)", icon='PLAY')
+            col_fake.separator()
             col_fake.label(text="1. 创建 End 骨骼:")
             row1 = col_fake.row(align=True)
             row1.operator("re4.fake_body_process", text="身体", icon='ARMATURE_DATA')